@@ -0,0 +1,304 @@
+"""
+Precomputed price aggregates per neighbourhood x room_type.
+
+``build_aggregates`` computes count, mean, median, p10, p90 and std of the
+nightly price for every neighbourhood/room_type pair, plus neighbourhood,
+room-type and city-wide rollups used as fallbacks.  Where the listings
+have review counts it also estimates occupancy (mean/std per group).  ``CityAggregates``
+serves lookups from a dict, so nothing scans the raw listings at request
+time.  The cube is persisted next to the Parquet cache, keyed on the data
+version.
+"""
+import glob
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import datasets
+
+STAT_COLUMNS = ["count", "mean", "median", "p10", "p90", "std", "occupancy_mean", "occupancy_std"]
+KEY_COLUMNS = ["level", "neighbourhood", "room_type"]
+
+# Rollup levels, most specific first; lookups fall back in this order.
+LEVEL_PAIR = "neighbourhood_room_type"
+LEVEL_NEIGHBOURHOOD = "neighbourhood"
+LEVEL_ROOM_TYPE = "room_type"
+LEVEL_CITY = "city"
+
+# Bump when the cube's columns change so persisted cubes are rebuilt.
+CUBE_VERSION = 2
+
+# Inside Airbnb's occupancy model: roughly half of stays leave a review,
+# an average stay is 3 nights (or the minimum stay, if longer), and
+# estimates are capped at 70% occupancy.
+REVIEW_RATE = 0.5
+AVERAGE_STAY_NIGHTS = 3.0
+MAX_OCCUPANCY = 0.7
+
+
+def estimate_occupancy(df):
+    """
+    Yearly occupancy estimate per listing (NaN without review counts).
+    """
+    if "number_of_reviews_ltm" not in df:
+        return pd.Series(float("nan"), index=df.index)
+    stay = AVERAGE_STAY_NIGHTS
+    if "minimum_nights" in df:
+        stay = df["minimum_nights"].astype("float64").clip(lower=AVERAGE_STAY_NIGHTS).fillna(AVERAGE_STAY_NIGHTS)
+    nights = df["number_of_reviews_ltm"].astype("float64") / REVIEW_RATE * stay
+    return (nights / 365.0).clip(upper=MAX_OCCUPANCY)
+
+
+def _price_stats(grouped, occupancy):
+    """
+    Vectorized price and occupancy statistics for one grouping.
+    """
+    stats = grouped.agg(["count", "mean", "median", "std"])
+    quantiles = grouped.quantile([0.1, 0.9]).unstack()
+    stats["p10"] = quantiles[0.1]
+    stats["p90"] = quantiles[0.9]
+    occupancy_stats = occupancy.agg(["mean", "std"])
+    stats["occupancy_mean"] = occupancy_stats["mean"]
+    stats["occupancy_std"] = occupancy_stats["std"]
+    return stats[STAT_COLUMNS]
+
+
+def _level_stats(price, occupancy, df, level, mask=None):
+    """
+    Cube rows for one level, optionally over the ``mask``ed listings only.
+    """
+    if mask is not None:
+        price, occupancy, df = price[mask], occupancy[mask], df[mask]
+    keys = {
+        LEVEL_PAIR: [df["neighbourhood"], df["room_type"]],
+        LEVEL_NEIGHBOURHOOD: [df["neighbourhood"]],
+        LEVEL_ROOM_TYPE: [df["room_type"]],
+        LEVEL_CITY: [pd.Series(0, index=price.index, name="city")],
+    }[level]
+    stats = _price_stats(
+        price.groupby(keys, observed=True), occupancy.groupby(keys, observed=True)
+    ).reset_index().assign(level=level)
+    return stats.drop(columns="city") if level == LEVEL_CITY else stats
+
+
+def _finish_cube(parts):
+    """
+    Concatenate cube rows into the canonical layout: level by level (most
+    specific first), then by neighbourhood and room type.
+    """
+    cube = pd.concat(parts, ignore_index=True)
+    for col in ["neighbourhood", "room_type"]:
+        cube[col] = cube[col].astype(object).where(cube[col].notna(), None)
+    cube["count"] = cube["count"].astype("int64")
+    order = {LEVEL_PAIR: 0, LEVEL_NEIGHBOURHOOD: 1, LEVEL_ROOM_TYPE: 2, LEVEL_CITY: 3}
+    cube = cube.assign(_order=cube["level"].map(order)).sort_values(
+        ["_order", "neighbourhood", "room_type"], na_position="last", kind="stable"
+    )
+    return cube[KEY_COLUMNS + STAT_COLUMNS].reset_index(drop=True)
+
+
+def build_aggregates(df):
+    """
+    Build the aggregate cube for one city's listings.
+
+    Returns a flat DataFrame with ``KEY_COLUMNS`` + ``STAT_COLUMNS``; rollup
+    rows have None in the key columns they aggregate over.
+    """
+    price = df["price"].astype("float64")
+    occupancy = estimate_occupancy(df)
+    return _finish_cube([
+        _level_stats(price, occupancy, df, level)
+        for level in (LEVEL_PAIR, LEVEL_NEIGHBOURHOOD, LEVEL_ROOM_TYPE, LEVEL_CITY)
+    ])
+
+
+def update_aggregates(cube, df, changed_pairs):
+    """
+    Cube for ``df`` from the ``cube`` of an earlier snapshot of it.
+
+    Only the rows the changes can affect are recomputed: the
+    ``changed_pairs`` (neighbourhood, room_type) themselves, the rollups of
+    their neighbourhoods and room types, and the city row.  Everything else
+    is carried over, and both go through ``_finish_cube``, so the result
+    equals ``build_aggregates(df)``, row order included.
+    """
+    if not changed_pairs:
+        return cube
+    neighbourhoods = {nb for nb, _ in changed_pairs}
+    room_types = {rt for _, rt in changed_pairs}
+    price = df["price"].astype("float64")
+    occupancy = estimate_occupancy(df)
+
+    # Listing masks from category codes, so no strings are hashed per row.
+    listing_nb = df["neighbourhood"].astype("category").cat
+    listing_rt = df["room_type"].astype("category").cat
+    nb_codes = listing_nb.codes.to_numpy().astype("int64")
+    rt_codes = listing_rt.codes.to_numpy().astype("int64")
+    n_rt = len(listing_rt.categories)
+    changed_nb = listing_nb.categories.get_indexer([nb for nb, _ in changed_pairs])
+    changed_rt = listing_rt.categories.get_indexer([rt for _, rt in changed_pairs])
+    known = (changed_nb >= 0) & (changed_rt >= 0)
+    changed_rows = np.isin(nb_codes * n_rt + rt_codes, changed_nb[known] * n_rt + changed_rt[known])
+    nb_rows = np.isin(nb_codes, changed_nb[changed_nb >= 0])
+    rt_rows = np.isin(rt_codes, changed_rt[changed_rt >= 0])
+
+    pair_keys = pd.MultiIndex.from_arrays([cube["neighbourhood"], cube["room_type"]])
+    stale = (
+        ((cube["level"] == LEVEL_PAIR) & pair_keys.isin(list(changed_pairs)))
+        | ((cube["level"] == LEVEL_NEIGHBOURHOOD) & cube["neighbourhood"].isin(neighbourhoods))
+        | ((cube["level"] == LEVEL_ROOM_TYPE) & cube["room_type"].isin(room_types))
+        | (cube["level"] == LEVEL_CITY)
+    )
+    # A pair (or group) whose listings all went away just drops out.
+    fresh = [
+        _level_stats(price, occupancy, df, level, mask)
+        for level, mask in (
+            (LEVEL_PAIR, changed_rows), (LEVEL_NEIGHBOURHOOD, nb_rows), (LEVEL_ROOM_TYPE, rt_rows),
+        )
+        if mask.any()
+    ]
+    fresh.append(_level_stats(price, occupancy, df, LEVEL_CITY))
+    return _finish_cube([cube[~stale], *fresh])
+
+
+def generate_csv_summary(cube, city_name):
+    """
+    Summarize the Airbnb CSV (by neighbourhood & room_type).
+    """
+    pair = cube[cube["level"] == LEVEL_PAIR]
+    lines = (
+        "- " + pair["neighbourhood"].astype(str) + " / " + pair["room_type"].astype(str)
+        + ": Average Price = £" + pair["mean"].map("{:.2f}".format)
+        + ", Listings = " + pair["count"].astype(str)
+    )
+    header = f"Summary of {city_name} data (by neighbourhood & room_type):"
+    return "\n".join([header, *lines])
+
+
+def _key(value):
+    return None if pd.isna(value) else value
+
+
+class CityAggregates:
+    """
+    Read-only view over a city's aggregate cube with O(1) lookups.
+    """
+
+    def __init__(self, cube, summaries=None):
+        self.cube = cube
+        records = cube.to_dict("records")
+        self._stats = {
+            (row["level"], _key(row["neighbourhood"]), _key(row["room_type"])): {col: row[col] for col in STAT_COLUMNS}
+            for row in records
+        }
+        pair = cube[cube["level"] == LEVEL_PAIR]
+        self.neighbourhoods = sorted(pair["neighbourhood"].unique())
+        self.room_types = sorted(pair["room_type"].unique())
+        # Prompt summaries by city name, optionally prebuilt (startup_bundle.py).
+        self._summaries = dict(summaries or {})
+        # Approximate memory held by the cube and its lookup table, measured
+        # once here (the cube is never modified).
+        stats = sys.getsizeof(self._stats) + sum(sys.getsizeof(row) for row in self._stats.values())
+        self.nbytes = int(cube.memory_usage(deep=True).sum()) + stats
+
+    def lookup(self, neighbourhood, room_type):
+        """
+        Price stats for a neighbourhood/room_type pair.
+
+        Falls back to the neighbourhood, then the room type, then the whole
+        city when the pair has no priced listings. The ``level`` key of the
+        result says which one answered.
+        """
+        candidates = [
+            (LEVEL_PAIR, neighbourhood, room_type),
+            (LEVEL_NEIGHBOURHOOD, neighbourhood, None),
+            (LEVEL_ROOM_TYPE, None, room_type),
+        ]
+        for key in candidates:
+            stats = self._stats.get(key)
+            if stats is not None and stats["count"] > 0:
+                return {"level": key[0], **stats}
+        return self.city()
+
+    def lookup_many(self, neighbourhoods, room_types):
+        """
+        ``lookup`` for many pairs at once.
+
+        Returns a DataFrame with ``level`` plus the stat columns, one row
+        per input pair, using the same fallback order as ``lookup``.
+        """
+        neighbourhoods = pd.Index(pd.Series(neighbourhoods, dtype=object).to_numpy())
+        room_types = pd.Index(pd.Series(room_types, dtype=object).to_numpy())
+        n = len(neighbourhoods)
+        result = pd.DataFrame(self.city(), index=pd.RangeIndex(n)).astype({"level": object})
+        priced = self.cube[self.cube["count"] > 0]
+        # Broadest level first, so each narrower one overwrites it where it has data.
+        for level, keys in (
+            (LEVEL_ROOM_TYPE, room_types),
+            (LEVEL_NEIGHBOURHOOD, neighbourhoods),
+            (LEVEL_PAIR, pd.MultiIndex.from_arrays([neighbourhoods, room_types])),
+        ):
+            rows = priced[priced["level"] == level]
+            if level == LEVEL_PAIR:
+                index = pd.MultiIndex.from_frame(rows[["neighbourhood", "room_type"]].astype(object))
+            else:
+                index = pd.Index(rows[level].astype(object))
+            positions = index.get_indexer(keys)
+            hit = positions >= 0
+            if hit.any():
+                result.loc[hit, STAT_COLUMNS] = rows[STAT_COLUMNS].to_numpy()[positions[hit]]
+                result.loc[hit, "level"] = level
+        return result
+
+    def city(self):
+        """
+        City-wide price stats.
+        """
+        return {"level": LEVEL_CITY, **self._stats[(LEVEL_CITY, None, None)]}
+
+    def summary_text(self, city_name):
+        """
+        Prompt summary for the chatbot, built once per city name.
+        """
+        if city_name not in self._summaries:
+            self._summaries[city_name] = generate_csv_summary(self.cube, city_name)
+        return self._summaries[city_name]
+
+
+def aggregates_path(csv_path, version, cache_dir=datasets.CACHE_DIR):
+    stem = datasets.cache_stem(csv_path)
+    return os.path.join(cache_dir, f"{stem}.aggregates.{version}.c{CUBE_VERSION}.parquet")
+
+
+def load_aggregates(csv_path, df, cache_dir=datasets.CACHE_DIR):
+    """
+    Load the persisted cube for ``csv_path`` or build and persist it.
+
+    ``df`` must be the listings currently cached for ``csv_path``.
+    """
+    version = datasets.data_version(csv_path, cache_dir)
+    path = aggregates_path(csv_path, version, cache_dir)
+    if os.path.exists(path):
+        return CityAggregates(pd.read_parquet(path, engine="pyarrow"))
+
+    cube = build_aggregates(df)
+    save_aggregates(csv_path, cube, cache_dir)
+    return CityAggregates(cube)
+
+
+def save_aggregates(csv_path, cube, cache_dir=datasets.CACHE_DIR):
+    """
+    Persist ``cube`` as the aggregates of the data now cached for
+    ``csv_path``, replacing older versions.
+    """
+    path = aggregates_path(csv_path, datasets.data_version(csv_path, cache_dir), cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = datasets.cache_stem(csv_path)
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}.aggregates.*.parquet")):
+        os.remove(stale)
+    tmp_path = path + ".tmp"
+    cube.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, path)
+    return path
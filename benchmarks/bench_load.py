@@ -0,0 +1,63 @@
+"""
+Compare the old ``pd.read_csv`` load path against the columnar cache.
+
+Usage:
+    python benchmarks/bench_load.py [london_listings.csv paris_listings.csv ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasets  # noqa: E402
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_city(csv_path, repeat=5):
+    """
+    Time the three load paths for one CSV and print them side by side.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        t_csv = _best_of(lambda: pd.read_csv(csv_path), repeat)
+
+        start = time.perf_counter()
+        datasets.build_columnar_cache(csv_path, cache_dir)
+        t_build = time.perf_counter() - start
+
+        def cold_parquet():
+            datasets.clear_memory_cache()
+            datasets.load_listings(csv_path, cache_dir)
+
+        t_parquet = _best_of(cold_parquet, repeat)
+        t_warm = _best_of(lambda: datasets.load_listings(csv_path, cache_dir), repeat * 20)
+
+        parquet_path, _ = datasets.cache_paths(csv_path, cache_dir)
+        csv_mb = os.path.getsize(csv_path) / 1e6
+        parquet_mb = os.path.getsize(parquet_path) / 1e6
+
+    print(f"{os.path.basename(csv_path)} ({csv_mb:.1f} MB csv -> {parquet_mb:.1f} MB parquet)")
+    print(f"  read_csv            : {t_csv * 1e3:10.2f} ms")
+    print(f"  one-off conversion  : {t_build * 1e3:10.2f} ms")
+    print(f"  parquet (cold)      : {t_parquet * 1e3:10.2f} ms  ({t_csv / t_parquet:.1f}x faster)")
+    print(f"  process cache (warm): {t_warm * 1e6:10.2f} us  ({t_csv / t_warm:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["london_listings.csv", "paris_listings.csv"]
+    for path in paths:
+        if os.path.exists(path):
+            bench_city(path)
+        else:
+            print(f"{path}: not found, skipped")
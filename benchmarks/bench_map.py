@@ -0,0 +1,61 @@
+"""
+Payload size and build time of the "Explore Map" figure.
+
+Compares the old approach (every listing handed to px.scatter_mapbox) with
+the binned MapData views at several zoom levels.  "build" is figure
+construction plus JSON serialization, i.e. the server-side cost of a map
+rerun; "payload" is the JSON Streamlit sends to the browser.
+
+Usage:
+    python benchmarks/bench_map.py [City ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plotly.express as px  # noqa: E402
+
+import map_data  # noqa: E402
+from city_registry import get_registry  # noqa: E402
+
+
+def _measure(build):
+    start = time.perf_counter()
+    payload = build().to_json()
+    return time.perf_counter() - start, len(payload)
+
+
+def legacy_figure(df):
+    df_map = df.copy()
+    df_map.dropna(subset=["price", "latitude", "longitude"], inplace=True)
+    return px.scatter_mapbox(
+        df_map, lat="latitude", lon="longitude", color="price", size="price",
+        color_continuous_scale=px.colors.cyclical.IceFire, size_max=15, zoom=10,
+        mapbox_style="carto-positron", hover_name="neighbourhood",
+        hover_data={"price": True, "latitude": False, "longitude": False},
+    )
+
+
+def bench_city(city, dataset):
+    print(f"{city} ({len(dataset.df):,} listings)")
+    seconds, size = _measure(lambda: legacy_figure(dataset.df))
+    print(f"  all points (old)   build {seconds * 1e3:8.1f} ms  payload {size / 1e6:7.2f} MB")
+
+    start = time.perf_counter()
+    prepared = map_data.MapData(dataset.df)
+    print(f"  one-off prepare    {(time.perf_counter() - start) * 1e3:8.1f} ms")
+    for zoom in (9, 10, 12, map_data.POINT_ZOOM_THRESHOLD):
+        mode, frame = prepared.view(zoom)
+        seconds, size = _measure(lambda: map_data.build_figure(prepared, zoom, city))
+        print(
+            f"  zoom {zoom:<2} {mode:<7} build {seconds * 1e3:8.1f} ms  payload {size / 1e6:7.2f} MB"
+            f"  ({len(frame):,} markers)"
+        )
+
+
+if __name__ == "__main__":
+    registry = get_registry()
+    for city in sys.argv[1:] or registry.city_names():
+        bench_city(city, registry.get(city))
@@ -0,0 +1,66 @@
+"""
+Per-city memory before/after the schema-driven loader.
+
+Reports the deep DataFrame size and the resident-set growth of a fresh
+process that loads the file each way.
+
+Usage:
+    python benchmarks/bench_memory.py [london_listings.csv paris_listings.csv ...]
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasets  # noqa: E402
+
+
+def _current_rss_mb():
+    with open("/proc/self/status", "r", encoding="ascii") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _rss_growth_mb(mode, csv_path, queue):
+    import pandas as pd
+
+    before = _current_rss_mb()
+    if mode == "raw":
+        df = pd.read_csv(csv_path)
+    else:
+        df = datasets.read_listings_csv(csv_path)
+    gc.collect()
+    queue.put(_current_rss_mb() - before)
+    del df
+
+
+def rss_growth_mb(mode, csv_path):
+    """
+    RSS growth (MB) of a fresh process holding ``csv_path`` in memory.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_rss_growth_mb, args=(mode, csv_path, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["london_listings.csv", "paris_listings.csv"]
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"{path}: not found, skipped")
+            continue
+        report = datasets.memory_report(path)
+        raw_rss, compact_rss = rss_growth_mb("raw", path), rss_growth_mb("compact", path)
+        print(os.path.basename(path))
+        print(f"  DataFrame  raw {report['raw'] / 1e6:8.1f} MB -> compact {report['compact'] / 1e6:8.1f} MB"
+              f"  ({report['raw'] / report['compact']:.1f}x)")
+        print(f"  RSS        raw {raw_rss:8.1f} MB -> compact {compact_rss:8.1f} MB"
+              f"  ({raw_rss / max(compact_rss, 1e-9):.1f}x)")
@@ -0,0 +1,63 @@
+"""
+Check PricePredictor latency against price_model.LATENCY_TARGETS_MS.
+
+Scores single properties and 10,000-row batches sampled from the city's
+listings with the newest trained model, prints p50/p99 and exits non-zero
+if a target is missed.
+
+Usage:
+    python benchmarks/bench_predict.py [City ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import price_model  # noqa: E402
+from city_registry import get_registry  # noqa: E402
+
+
+def _latencies_ms(fn, runs):
+    fn()  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return np.percentile(samples, [50, 99])
+
+
+def bench_city(city, dataset):
+    predictor = price_model.get_predictor(city)
+    if predictor is None:
+        print(f"{city}: no trained model (run train_model.py), skipped")
+        return True
+
+    rows = dataset.df.sample(10_000, replace=True, random_state=0)
+    single = rows.iloc[:1][["neighbourhood", "room_type"]].to_dict("records")[0]
+    results = {
+        "single": _latencies_ms(lambda: predictor.predict_one(**single), runs=500),
+        "batch_10000": _latencies_ms(lambda: predictor.predict(rows), runs=50),
+    }
+
+    ok = True
+    print(f"{city} (model v{predictor.version})")
+    for name, (p50, p99) in results.items():
+        target = price_model.LATENCY_TARGETS_MS[name]
+        passed = p50 <= target["p50"] and p99 <= target["p99"]
+        ok &= passed
+        print(
+            f"  {name:<12} p50 {p50:8.2f} ms (target {target['p50']:.0f})"
+            f"  p99 {p99:8.2f} ms (target {target['p99']:.0f})  {'OK' if passed else 'MISSED'}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    registry = get_registry()
+    cities = sys.argv[1:] or registry.city_names()
+    all_ok = all([bench_city(city, registry.get(city)) for city in cities])
+    sys.exit(0 if all_ok else 1)
@@ -0,0 +1,219 @@
+"""
+Stage-by-stage benchmark of the app's data path on synthetic listings.
+
+For each dataset size this generates (once) a synthetic Inside Airbnb CSV
+with synthetic_listings.py and times the stages the app runs for a city:
+
+    load_csv      datasets.read_listings_csv (first load of a new file)
+    load_cache    datasets.load_listings from the Parquet cache (cold process)
+    summarize     aggregates.build_aggregates + generate_csv_summary
+    filter        CityAggregates + a lookup for every neighbourhood/room type
+    map_prep      MapData + the binned and point views
+    prompt_build  ContextIndex + select + the system message, per question
+
+Each stage is timed best-of-``--repeat``, then run once more under
+tracemalloc for its peak traced allocation (NumPy/pandas/Python memory;
+Arrow's own allocator is not traced).  Results are compared with
+benchmarks/baseline.json: a stage regresses when it is slower than
+``--time-threshold`` or bigger than ``--memory-threshold`` relative to the
+baseline (ignoring differences under 5 ms / 1 MB), and the script then
+exits non-zero.  Nothing touches the network or needs an API key.
+
+Usage:
+    python benchmarks/bench_stages.py                      # 10k, 100k, 1m
+    python benchmarks/bench_stages.py --sizes 10k,100k,1m,10m
+    python benchmarks/bench_stages.py --update-baseline     # record this machine's numbers
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import aggregates  # noqa: E402
+import chat  # noqa: E402
+import datasets  # noqa: E402
+import map_data  # noqa: E402
+import prompt_context  # noqa: E402
+from synthetic_listings import ensure_listings  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DATA_DIR = os.path.join(os.path.dirname(BENCH_DIR), "files", "bench")
+DEFAULT_SIZES = "10k,100k,1m"
+CITY = "London"
+QUESTIONS = [
+    "What is the average price for an entire flat in Camden?",
+    "Which neighbourhoods have the best ROI for private rooms?",
+    "Compare Hackney and Islington for a two-bedroom apartment.",
+    "How does Westminster occupancy compare to the city average?",
+    "Is a hotel room in the City of London a good investment?",
+]
+# Differences below these are treated as noise.
+MIN_SECONDS_DELTA = 0.005
+MIN_MB_DELTA = 1.0
+
+
+def stage_load_csv(ctx):
+    return {"df": datasets.read_listings_csv(ctx["csv_path"])}
+
+
+def stage_load_cache(ctx):
+    datasets.clear_memory_cache()
+    return {"cached_df": datasets.load_listings(ctx["csv_path"], ctx["cache_dir"])}
+
+
+def stage_summarize(ctx):
+    cube = aggregates.build_aggregates(ctx["df"])
+    return {"cube": cube, "summary": aggregates.generate_csv_summary(cube, CITY)}
+
+
+def stage_filter(ctx):
+    city_aggregates = aggregates.CityAggregates(ctx["cube"])
+    stats = [
+        city_aggregates.lookup(nb, rt)
+        for nb in city_aggregates.neighbourhoods
+        for rt in city_aggregates.room_types
+    ]
+    return {"city_aggregates": city_aggregates, "stats": stats}
+
+
+def stage_map_prep(ctx):
+    prepared = map_data.MapData(ctx["df"])
+    views = [prepared.view(zoom) for zoom in (10, 12, map_data.POINT_ZOOM_THRESHOLD)]
+    return {"map_views": views}
+
+
+def stage_prompt_build(ctx):
+    index = prompt_context.ContextIndex(ctx["city_aggregates"], CITY)
+    prompts = [
+        chat.build_system_message(CITY, index.select(question), "")
+        for question in QUESTIONS
+    ]
+    return {"prompts": prompts}
+
+
+STAGES = [
+    ("load_csv", stage_load_csv),
+    ("load_cache", stage_load_cache),
+    ("summarize", stage_summarize),
+    ("filter", stage_filter),
+    ("map_prep", stage_map_prep),
+    ("prompt_build", stage_prompt_build),
+]
+
+
+def run_size(size, repeat, measure_memory=True, seed=0):
+    """
+    ``{stage: {"seconds": best, "peak_mb": peak}}`` for one dataset size.
+    """
+    csv_path = ensure_listings(size, DATA_DIR, seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        datasets.build_columnar_cache(csv_path, cache_dir)
+        ctx = {"csv_path": csv_path, "cache_dir": cache_dir}
+        for name, stage in STAGES:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs = stage(ctx)
+                best = min(best, time.perf_counter() - start)
+            results[name] = {"seconds": best}
+            if measure_memory:
+                del outputs
+                tracemalloc.start()
+                outputs = stage(ctx)
+                results[name]["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            ctx.update(outputs)
+        datasets.clear_memory_cache()
+    return results
+
+
+def compare(size, results, baseline, time_threshold, memory_threshold):
+    """
+    Print one size's results against the baseline; returns the regressions.
+    """
+    base = baseline.get("results", {}).get(size, {})
+    regressions = []
+    print(f"{size} rows")
+    for name, measured in results.items():
+        line = f"  {name:<13} {measured['seconds'] * 1e3:10.1f} ms"
+        if "peak_mb" in measured:
+            line += f"  {measured['peak_mb']:9.1f} MB"
+        reference = base.get(name)
+        if reference:
+            checks = [("seconds", time_threshold, MIN_SECONDS_DELTA, "time")]
+            if "peak_mb" in measured and "peak_mb" in reference:
+                checks.append(("peak_mb", memory_threshold, MIN_MB_DELTA, "memory"))
+            notes = []
+            for key, threshold, floor, label in checks:
+                old, new = reference[key], measured[key]
+                change = (new - old) / old if old else 0.0
+                notes.append(f"{label} {change:+.0%}")
+                if new - old > floor and change > threshold:
+                    regressions.append(f"{size} {name} {label}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+                    notes[-1] += " REGRESSION"
+            line += "  vs baseline: " + ", ".join(notes)
+        print(line)
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_baseline(path, baseline, measured):
+    baseline = {
+        "machine": f"{platform.machine()} {platform.system()} {os.cpu_count()} CPUs, Python {platform.python_version()}",
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": {**baseline.get("results", {}), **measured},
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(baseline, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated: 10k, 100k, 1m, 10m")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="allowed peak memory growth")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    if baseline and not args.update_baseline:
+        print(f"baseline: {baseline.get('machine')} ({baseline.get('recorded_at')})")
+    measured = {}
+    regressions = []
+    for size in [s.strip().lower() for s in args.sizes.split(",") if s.strip()]:
+        # The 10M-row file takes minutes per pass; one timing run is plenty.
+        repeat = 1 if size == "10m" else args.repeat
+        measured[size] = run_size(size, repeat, measure_memory=not args.no_memory)
+        regressions += compare(size, measured[size], {} if args.update_baseline else baseline,
+                               args.time_threshold, args.memory_threshold)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(measured, fh, indent=2)
+    if args.update_baseline:
+        save_baseline(args.baseline, baseline, measured)
+        print(f"baseline written to {args.baseline}")
+    elif regressions:
+        print("\nRegressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
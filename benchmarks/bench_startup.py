@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark of the Streamlit app.
+
+Every measurement runs the app in a fresh Python process with Streamlit's
+AppTest (no server, browser or API key needed), so nothing is already
+imported or loaded:
+
+    login       process start -> login page rendered, plus the app's own
+                script run and which heavy modules it imported
+    city        first script run after login with a city selected, served
+                from the city's startup bundle (``python startup_bundle.py``)
+                and, for comparison, with the bundles moved aside
+
+Each figure is the best of ``--repeat`` processes.  Data refresh watching is
+turned off in the measured processes.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --city Paris --repeat 5
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+APP = os.path.join(APP_DIR, "investor.py")
+HEAVY_MODULES = ["pandas", "pyarrow", "sklearn", "aiohttp", "plotly.express"]
+
+
+def child(view, city):
+    """
+    Run in the measured process: render ``view`` and print timings as JSON.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    if view == "city":
+        at.session_state["authenticated"] = True
+        at.session_state["username"] = "KPMG"
+        at.session_state["city_selected"] = city
+    start = time.perf_counter()
+    at.run()
+    run_seconds = time.perf_counter() - start
+    if at.exception:
+        raise SystemExit(f"app raised: {at.exception}")
+    print(json.dumps({
+        "run_seconds": run_seconds,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def measure(view, city, repeat):
+    """
+    Best wall time (process start to exit) and best script run of ``repeat`` processes.
+    """
+    env = {**os.environ, "DATA_REFRESH": "0"}
+    best_wall, best_run, result = float("inf"), float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", view, "--city", city],
+            cwd=APP_DIR, env=env, check=True, capture_output=True, text=True,
+        )
+        best_wall = min(best_wall, time.perf_counter() - start)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best_run = min(best_run, result["run_seconds"])
+    return best_wall, best_run, result["heavy_modules"]
+
+
+def without_bundles(fn):
+    """
+    Call ``fn`` with the startup bundles moved out of the cache directory.
+    """
+    import datasets
+
+    moved = tempfile.mkdtemp()
+    paths = glob.glob(os.path.join(datasets.CACHE_DIR, "*.startup.*.pkl"))
+    try:
+        for path in paths:
+            shutil.move(path, moved)
+        return fn()
+    finally:
+        for path in paths:
+            shutil.move(os.path.join(moved, os.path.basename(path)), path)
+        os.rmdir(moved)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--city", default="London")
+    parser.add_argument("--repeat", type=int, default=3, help="processes per measurement (best is kept)")
+    parser.add_argument("--child", choices=["login", "city"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.city)
+        sys.exit(0)
+
+    wall, run, modules = measure("login", args.city, args.repeat)
+    print(f"login page       cold start {wall * 1e3:7.0f} ms   app script {run * 1e3:6.0f} ms"
+          f"   heavy modules: {', '.join(modules) or 'none'}")
+    wall, run, _ = measure("city", args.city, args.repeat)
+    print(f"{args.city} (bundle)  cold start {wall * 1e3:7.0f} ms   app script {run * 1e3:6.0f} ms")
+    wall, run, _ = without_bundles(lambda: measure("city", args.city, args.repeat))
+    print(f"{args.city} (no bundle) cold start {wall * 1e3:5.0f} ms   app script {run * 1e3:6.0f} ms")
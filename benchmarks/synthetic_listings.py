@@ -0,0 +1,131 @@
+"""
+Synthetic listings in the Inside Airbnb ``listings.csv`` schema.
+
+Prices, occupancy-related review counts and coordinates follow rough
+London-like distributions (lognormal prices that vary by borough and room
+type, listings clustered around borough centres), so every stage of the
+app has realistic work to do.  Output is deterministic for a given size
+and seed and is written in chunks, so 10M-row files never sit in memory.
+
+Usage:
+    python benchmarks/synthetic_listings.py 1m out.csv [--seed 0]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+CHUNK_ROWS = 500_000
+
+NEIGHBOURHOODS = [
+    "Barking and Dagenham", "Barnet", "Bexley", "Brent", "Bromley", "Camden", "City of London",
+    "Croydon", "Ealing", "Enfield", "Greenwich", "Hackney", "Hammersmith and Fulham", "Haringey",
+    "Harrow", "Havering", "Hillingdon", "Hounslow", "Islington", "Kensington and Chelsea",
+    "Kingston upon Thames", "Lambeth", "Lewisham", "Merton", "Newham", "Redbridge",
+    "Richmond upon Thames", "Southwark", "Sutton", "Tower Hamlets", "Waltham Forest",
+    "Wandsworth", "Westminster",
+]
+ROOM_TYPES = ["Entire home/apt", "Private room", "Shared room", "Hotel room"]
+ROOM_TYPE_SHARE = [0.62, 0.36, 0.01, 0.01]
+ROOM_TYPE_PRICE = np.array([1.0, 0.45, 0.3, 0.9])
+
+COLUMNS = [
+    "id", "name", "host_id", "host_name", "neighbourhood_group", "neighbourhood", "latitude",
+    "longitude", "room_type", "price", "minimum_nights", "number_of_reviews", "last_review",
+    "reviews_per_month", "calculated_host_listings_count", "availability_365",
+    "number_of_reviews_ltm", "license",
+]
+
+
+def parse_size(size):
+    """
+    Row count for "10k"/"100k"/"1m"/"10m" or a plain integer string.
+    """
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def generate_chunk(start, rows, seed=0):
+    """
+    Rows ``start`` .. ``start + rows`` of the synthetic dataset.
+    """
+    rng = np.random.default_rng([seed, start])
+    # Per-borough centre and price level are fixed by the seed alone.
+    layout = np.random.default_rng(seed)
+    centres = np.column_stack([
+        layout.uniform(51.38, 51.62, len(NEIGHBOURHOODS)),
+        layout.uniform(-0.40, 0.15, len(NEIGHBOURHOODS)),
+    ])
+    borough_price = layout.lognormal(np.log(110), 0.35, len(NEIGHBOURHOODS))
+
+    nb = rng.integers(0, len(NEIGHBOURHOODS), rows)
+    rt = rng.choice(len(ROOM_TYPES), rows, p=ROOM_TYPE_SHARE)
+    price = np.round(rng.lognormal(np.log(borough_price[nb] * ROOM_TYPE_PRICE[rt]), 0.5))
+    price[rng.random(rows) < 0.05] = np.nan
+
+    minimum_nights = rng.choice([1, 2, 3, 5, 7, 30], rows, p=[0.35, 0.25, 0.2, 0.1, 0.05, 0.05])
+    reviews_ltm = rng.poisson(rng.gamma(1.2, 6.0, rows))
+    reviews = reviews_ltm + rng.poisson(20, rows)
+    reviews_per_month = np.where(reviews > 0, np.round(reviews_ltm / 12 + rng.random(rows) * 0.2, 2), np.nan)
+    last_review = np.where(
+        reviews > 0,
+        (np.datetime64("2024-06-01") - rng.integers(0, 720, rows).astype("timedelta64[D]")).astype(str),
+        "",
+    )
+
+    return pd.DataFrame({
+        "id": np.arange(start, start + rows, dtype=np.int64) + 10_000,
+        "name": "Rental unit in London",
+        "host_id": rng.integers(1_000, 500_000_000, rows),
+        "host_name": "Host",
+        "neighbourhood_group": "",
+        "neighbourhood": np.asarray(NEIGHBOURHOODS, dtype=object)[nb],
+        "latitude": np.round(centres[nb, 0] + rng.normal(0, 0.012, rows), 6),
+        "longitude": np.round(centres[nb, 1] + rng.normal(0, 0.018, rows), 6),
+        "room_type": np.asarray(ROOM_TYPES, dtype=object)[rt],
+        "price": price,
+        "minimum_nights": minimum_nights,
+        "number_of_reviews": reviews,
+        "last_review": last_review,
+        "reviews_per_month": reviews_per_month,
+        "calculated_host_listings_count": rng.geometric(0.4, rows),
+        "availability_365": rng.integers(0, 366, rows),
+        "number_of_reviews_ltm": reviews_ltm,
+        "license": "",
+    }, columns=COLUMNS)
+
+
+def write_listings(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    Write ``rows`` synthetic listings to ``path`` (via a temp file).
+    """
+    tmp_path = path + ".tmp"
+    for start in range(0, rows, chunk_rows):
+        chunk = generate_chunk(start, min(chunk_rows, rows - start), seed)
+        chunk.to_csv(tmp_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_listings(size, data_dir, seed=0):
+    """
+    Path of the synthetic CSV for ``size``, generating it on first use.
+    """
+    rows = parse_size(size)
+    path = os.path.join(data_dir, f"synthetic_{size.lower()}_s{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"generating {rows:,} synthetic listings -> {path}", file=sys.stderr)
+        write_listings(path, rows, seed)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", help="10k, 100k, 1m, 10m or a row count")
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_listings(args.output, parse_size(args.size), args.seed)
@@ -0,0 +1,157 @@
+"""
+Chat completion helpers for the investment advisor.
+
+``complete_chat`` runs a chat completion through the pooled client in
+llm_client.py.  With ``stream=True`` it renders tokens as they arrive
+through an ``on_token`` callback.  Every call records time-to-first-token
+and total latency in a ``ChatTiming``, which ``answer_question`` reports
+to metrics.py; it also puts the persistent response cache (llm_cache.py)
+in front of the model.
+
+Point ``OPENAI_API_BASE`` at ``stub_openai_server.py`` to run offline.
+"""
+import logging
+import os
+import time
+
+import llm_client
+import metrics
+from prompt_context import count_tokens
+
+DEFAULT_MODEL = "gpt-4"
+
+logger = logging.getLogger(__name__)
+
+
+def streaming_enabled():
+    """
+    Streaming is on unless CHAT_STREAMING is set to 0/false/no.
+    """
+    return os.getenv("CHAT_STREAMING", "1").strip().lower() not in ("0", "false", "no")
+
+
+def configure_client():
+    """
+    Apply the API key, base URL and client limits from the environment.
+    """
+    llm_client.configure_from_env()
+
+
+def build_system_message(city, csv_summary, csv_info):
+    """
+    System prompt for the advisor.
+    """
+    return (
+        f"You are an Airbnb Investment Advisor for {city}.\n\n"
+        f"Below is summarized CSV data for the neighbourhoods and room types relevant to the question, "
+        f"plus city-wide totals:\n{csv_summary}\n\n"
+        "Neighbourhoods or room types missing from this summary were left out to save space; "
+        "they still have listings, so never treat them as having zero listings or no data.\n\n"
+        f"Additionally, optional snippet: {csv_info}\n\n"
+        "If the CSV does not have certain data (like occupancy rates), disclaim that Airbnb does not "
+        "provide those data points in this dataset, but you can approximate from external sources "
+        "using numeric or percentage-based insights. Always provide numeric or percentage-based data if possible. "
+        "Be concise, professional, and directly to the point. Present key details and the final most important output in bold or bullet points."
+    )
+
+
+class ChatTiming:
+    """
+    Latency of one completion, in seconds from the moment it was requested.
+    """
+
+    def __init__(self, model, streamed, cached=False, prompt_tokens=0):
+        self.model = model
+        self.streamed = streamed
+        self.cached = cached
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = 0
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.total = None
+
+    def mark_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        if self.first_token is None:
+            self.first_token = self.total
+
+    def as_dict(self):
+        return {
+            "model": self.model,
+            "streamed": self.streamed,
+            "cached": self.cached,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "ttft_s": self.first_token,
+            "total_s": self.total,
+        }
+
+
+def complete_chat(messages, model=DEFAULT_MODEL, stream=False, on_token=None):
+    """
+    Run one chat completion and return ``(content, ChatTiming)``.
+
+    When streaming, ``on_token`` is called with the text received so far
+    after every chunk.
+    """
+    timing = ChatTiming(model, stream, prompt_tokens=sum(count_tokens(m["content"]) for m in messages))
+    client = llm_client.get_client()
+    if not stream:
+        content = client.complete(messages, model)
+    else:
+        parts = []
+        for delta in client.stream(messages, model):
+            timing.mark_token()
+            parts.append(delta)
+            if on_token is not None:
+                on_token("".join(parts))
+        content = "".join(parts)
+    timing.finish()
+    timing.completion_tokens = count_tokens(content)
+    logger.info(
+        "chat completion model=%s streamed=%s prompt_tokens=%d completion_tokens=%d ttft=%.3fs total=%.3fs",
+        model, stream, timing.prompt_tokens, timing.completion_tokens, timing.first_token, timing.total,
+    )
+    return content, timing
+
+
+def answer_question(prompt, city, csv_summary, csv_info, model=DEFAULT_MODEL,
+                    stream=False, on_token=None, cache=None, history=None):
+    """
+    Answer an advisor question, serving repeats from ``cache`` if given.
+
+    ``history`` is the earlier conversation as chat messages (see
+    conversation.Conversation.model_history); it is part of the cache key,
+    so follow-up questions are only served answers given in the same
+    context.  Returns ``(content, ChatTiming)``; ``timing.cached`` tells
+    whether the model was called.
+    """
+    history = history or []
+    key = None
+    if cache is not None:
+        context = "\n".join([csv_summary, csv_info] + [f"{m['role']}: {m['content']}" for m in history])
+        key = cache.make_key(prompt, city, context, model)
+        content = cache.get(key)
+        if content is not None:
+            timing = ChatTiming(model, stream, cached=True)
+            if on_token is not None:
+                on_token(content)
+            timing.mark_token()
+            timing.finish()
+            metrics.record_llm_call(timing)
+            return content, timing
+
+    messages = [
+        {"role": "system", "content": build_system_message(city, csv_summary, csv_info)},
+        *history,
+        {"role": "user", "content": prompt},
+    ]
+    content, timing = complete_chat(messages, model=model, stream=stream, on_token=on_token)
+    metrics.record_llm_call(timing)
+    if cache is not None and content:
+        cache.put(key, content, city=city, model=model, prompt=prompt)
+    return content, timing
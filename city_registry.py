@@ -0,0 +1,349 @@
+"""
+Config-driven registry of the cities the app can serve.
+
+Cities are declared in ``cities.toml``.  A city's listings are loaded the
+first time it is requested (from its startup bundle when one is up to date,
+see startup_bundle.py), shared read-only by every Streamlit session in
+the process, and evicted least-recently-used first once the loaded data
+exceeds the configured memory budget.  A city can be switched to a newer
+listings snapshot at runtime (see data_refresh.py): ``swap`` replaces its
+entry in one step, so a session sees either the old data or the new.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import toml
+
+import aggregates
+import datasets
+import metrics
+import prompt_context
+import startup_bundle
+from map_data import MapData
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, "cities.toml")
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+
+class CityDataset:
+    """
+    One loaded city: its config entry, the shared listings DataFrame and
+    the structures derived from it (built on first use).
+
+    A dataset opened from a startup bundle starts with the aggregates and
+    map restored and reads its listings only when ``df`` is first used.
+    """
+
+    def __init__(self, name, config, df, csv_path, city_aggregates=None):
+        self.name = name
+        self.config = config
+        self.csv_path = csv_path
+        self.version = datasets.data_version(csv_path)
+        self._df = None
+        self._rows = None
+        self._df_bytes = 0
+        self._aggregates = city_aggregates
+        self._context_index = None
+        self._map_data = None
+        self._comps = None
+        # Called with the dataset after it loads its listings or builds a
+        # derived structure (set by CityRegistry to re-check its budget).
+        self.on_grow = None
+        # Reentrant: the derived structures read ``df`` under the lock.
+        self._lock = threading.RLock()
+        if df is not None:
+            self._set_df(df)
+
+    @classmethod
+    def from_bundle(cls, name, config, csv_path, bundle):
+        """
+        Dataset served from a startup_bundle bundle until ``df`` is needed.
+        """
+        dataset = cls(name, config, None, csv_path, aggregates.CityAggregates(bundle["cube"], bundle["summaries"]))
+        dataset._rows = bundle["rows"]
+        dataset._map_data = MapData.from_state(bundle["map"])
+        return dataset
+
+    def _set_df(self, df):
+        self._df = df
+        self._rows = len(df)
+        self._df_bytes = int(df.memory_usage(deep=True).sum())
+
+    @property
+    def df(self):
+        """
+        The listings, read through the columnar cache on first use.
+        """
+        if self._df is None:
+            with self._lock:
+                if self._df is None:
+                    with metrics.span("load_listings"):
+                        self._set_df(datasets.load_listings(self.csv_path))
+            self._grew()
+        return self._df
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory held by the listings and every structure built
+        from them so far.  Each part is measured once, when it is built, so
+        this only adds up a few integers.
+        """
+        built = (self._aggregates, self._context_index, self._map_data, self._comps)
+        return self._df_bytes + sum(part.nbytes for part in built if part is not None)
+
+    def _grew(self):
+        if self.on_grow is not None:
+            self.on_grow(self)
+
+    def is_current(self):
+        """
+        Whether this is still the data in the city's file.
+        """
+        if self._df is None:
+            return datasets.cached_version(self.csv_path) == self.version
+        return datasets.load_listings(self.csv_path) is self._df
+
+    @property
+    def banner(self):
+        """
+        Path of the city's banner image from cities.toml, or None.
+        """
+        return self.config.get("banner")
+
+    @property
+    def aggregates(self):
+        """
+        The city's CityAggregates cube.
+        """
+        if self._aggregates is None:
+            with self._lock:
+                if self._aggregates is None:
+                    with metrics.span("build_aggregates"):
+                        self._aggregates = aggregates.load_aggregates(self.csv_path, self.df)
+            self._grew()
+        return self._aggregates
+
+    @property
+    def context_index(self):
+        """
+        The city's prompt_context.ContextIndex over its aggregates.
+        """
+        if self._context_index is None:
+            city_aggregates = self.aggregates
+            with metrics.span("build_context_index"):
+                index = prompt_context.ContextIndex(city_aggregates, self.name)
+            with self._lock:
+                if self._context_index is None:
+                    self._context_index = index
+            self._grew()
+        return self._context_index
+
+    @property
+    def map_data(self):
+        """
+        The city's MapData (cleaned coordinates and per-zoom bins).
+        """
+        if self._map_data is None:
+            with self._lock:
+                if self._map_data is None:
+                    with metrics.span("build_map_data"):
+                        self._map_data = MapData(self.df)
+            self._grew()
+        return self._map_data
+
+    @property
+    def comps(self):
+        """
+        The city's CompsIndex (spatial index for comparable listings).
+        """
+        if self._comps is None:
+            # Imported on first use: scikit-learn is slow to import.
+            from comps import CompsIndex
+
+            with self._lock:
+                if self._comps is None:
+                    with metrics.span("build_comps"):
+                        self._comps = CompsIndex(self.df)
+            self._grew()
+        return self._comps
+
+
+class CityRegistry:
+    """
+    Lazily loads city datasets and keeps them within a memory budget.
+    """
+
+    def __init__(self, cities, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, base_dir=BASE_DIR):
+        self.cities = dict(cities)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.base_dir = base_dir
+        self._loaded = OrderedDict()
+        self._csv_paths = {}
+        # Guards _loaded and _csv_paths only; opening a city happens under
+        # that city's own lock so other cities are served meanwhile.
+        self._lock = threading.Lock()
+        self._open_locks = {city: threading.Lock() for city in self.cities}
+
+    @classmethod
+    def from_config(cls, path=CONFIG_PATH):
+        """
+        Build a registry from a ``cities.toml`` file.
+        """
+        config = toml.load(path)
+        budget = config.get("registry", {}).get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)
+        budget = float(os.getenv("CITY_MEMORY_BUDGET_MB", budget))
+        return cls(config.get("cities", {}), budget, os.path.dirname(os.path.abspath(path)))
+
+    def city_names(self):
+        return list(self.cities)
+
+    def city_config(self, city):
+        return self.cities.get(city)
+
+    def csv_path(self, city):
+        """
+        The listings file ``city`` is served from: the latest snapshot
+        swapped in, else the ``csv`` from the config.
+        """
+        path = self._csv_paths.get(city)
+        return path if path is not None else os.path.join(self.base_dir, self.cities[city]["csv"])
+
+    def snapshot_dir(self, city):
+        """
+        Directory watched for new listings snapshots of ``city``, or None.
+        """
+        snapshots = self.cities[city].get("snapshots")
+        return os.path.join(self.base_dir, snapshots) if snapshots else None
+
+    def loaded(self, city):
+        """
+        The CityDataset for ``city`` if it is in memory, without loading it.
+        """
+        return self._loaded.get(city)
+
+    def loaded_cities(self):
+        """
+        Names of the cities currently in memory, coldest first.
+        """
+        return list(self._loaded)
+
+    def memory_used(self):
+        return sum(entry.nbytes for entry in self._loaded.values())
+
+    def get(self, city):
+        """
+        Return the CityDataset for ``city``, loading it on first use.
+
+        Returns None for unknown cities (including the "None" placeholder).
+        """
+        if city not in self.cities:
+            return None
+
+        with metrics.span("open_city"):
+            entry = self._current(city)
+            if entry is None:
+                with self._open_locks[city]:
+                    # Another session may have opened it while this one waited.
+                    entry = self._current(city)
+                    if entry is None:
+                        csv_path = self.csv_path(city)
+                        entry = self._open(city, csv_path)
+                        with self._lock:
+                            # Unless a newer snapshot was swapped in meanwhile.
+                            if self.csv_path(city) == csv_path:
+                                self._install(city, entry)
+            # A warm request only updates the LRU order; the budget is
+            # checked when an entry is installed or grows (_install).
+            with self._lock:
+                if self._loaded.get(city) is entry:
+                    self._loaded.move_to_end(city)
+            return entry
+
+    def _current(self, city):
+        """
+        The loaded entry for ``city`` if it still matches its file, else None.
+        """
+        entry = self._loaded.get(city)
+        return entry if entry is not None and entry.is_current() else None
+
+    def _open(self, city, csv_path):
+        bundle = startup_bundle.load_bundle(csv_path)
+        if bundle is not None:
+            return CityDataset.from_bundle(city, self.cities[city], csv_path, bundle)
+        with metrics.span("load_listings"):
+            df = datasets.load_listings(csv_path)
+        return CityDataset(city, self.cities[city], df, csv_path)
+
+    def swap(self, city, csv_path, dataset=None):
+        """
+        Serve ``city`` from ``csv_path`` from now on.
+
+        ``dataset`` (a CityDataset over that file) replaces the loaded entry
+        atomically; without one the city is loaded from the new file on its
+        next request.  The old file's DataFrame is released either way.
+        """
+        with self._lock:
+            old_path = self.csv_path(city)
+            self._csv_paths[city] = csv_path
+            if dataset is not None:
+                self._install(city, dataset)
+            else:
+                self._loaded.pop(city, None)
+            if os.path.abspath(old_path) != os.path.abspath(csv_path):
+                datasets.evict(old_path)
+
+    def collect_metrics(self):
+        """
+        Refresh the per-city dataset gauges in metrics.py.
+        """
+        with self._lock:
+            loaded = list(self._loaded.values())
+        metrics.DATASET_BYTES.replace({(("city", entry.name),): entry.nbytes for entry in loaded})
+        metrics.DATASET_ROWS.replace({(("city", entry.name),): entry.rows for entry in loaded})
+
+    def _install(self, city, entry):
+        """
+        Make ``entry`` the hottest dataset for ``city`` and enforce the
+        budget, now and whenever the entry grows.  Call with the lock held.
+        """
+        entry.on_grow = self._entry_grew
+        self._loaded[city] = entry
+        self._loaded.move_to_end(city)
+        self._evict(keep=city)
+
+    def _entry_grew(self, entry):
+        with self._lock:
+            if self._loaded.get(entry.name) is entry:
+                self._evict(keep=entry.name)
+
+    def _evict(self, keep):
+        while self.memory_used() > self.memory_budget and len(self._loaded) > 1:
+            coldest = next(iter(self._loaded))
+            if coldest == keep:
+                break
+            self._loaded.pop(coldest)
+            datasets.evict(self.csv_path(coldest))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Process-wide registry shared by all sessions.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CityRegistry.from_config()
+                metrics.register_collector("city_registry", _registry.collect_metrics)
+    return _registry
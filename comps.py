@@ -0,0 +1,102 @@
+"""
+Nearest comparable listings ("comps") around a coordinate.
+
+``CompsIndex`` builds one haversine BallTree per room type (plus one over
+all listings) the first time a city's comps are needed and keeps it for
+that data version.  A query returns the k nearest priced listings of the
+same room type within a radius, plus distance-weighted price statistics.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_K = 10
+DEFAULT_RADIUS_KM = 1.0
+# Added to distances before inverting them into weights (50 m).
+DISTANCE_FLOOR_KM = 0.05
+
+
+def _weighted_quantile(values, weights, q):
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    cumulative = (np.cumsum(weights) - 0.5 * weights) / weights.sum()
+    return float(np.interp(q, cumulative, values))
+
+
+class CompsResult:
+    """
+    Comparable listings for one query and their price statistics.
+    """
+
+    def __init__(self, comps):
+        self.comps = comps
+        self.count = len(comps)
+        if self.count:
+            prices = comps["price"].to_numpy(dtype=np.float64)
+            weights = 1.0 / (comps["distance_km"].to_numpy(dtype=np.float64) + DISTANCE_FLOOR_KM)
+            self.weighted_mean = float(np.average(prices, weights=weights))
+            self.weighted_median = _weighted_quantile(prices, weights, 0.5)
+            self.p10 = _weighted_quantile(prices, weights, 0.1)
+            self.p90 = _weighted_quantile(prices, weights, 0.9)
+            self.max_distance_km = float(comps["distance_km"].max())
+        else:
+            self.weighted_mean = self.weighted_median = self.p10 = self.p90 = None
+            self.max_distance_km = None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "weighted_mean": self.weighted_mean,
+            "weighted_median": self.weighted_median,
+            "p10": self.p10,
+            "p90": self.p90,
+            "max_distance_km": self.max_distance_km,
+        }
+
+
+class CompsIndex:
+    """
+    Spatial index over one city's priced listings.
+    """
+
+    def __init__(self, df):
+        clean = df[["latitude", "longitude", "price", "room_type", "neighbourhood"]].dropna(
+            subset=["latitude", "longitude", "price"]
+        )
+        clean = clean[clean["price"] > 0].reset_index(drop=True)
+        self.listings = clean
+        self._trees = {}
+        self._rows = {}
+        coords = np.radians(clean[["latitude", "longitude"]].to_numpy(dtype=np.float64))
+        self._build(None, coords, np.arange(len(clean)))
+        room_types = clean["room_type"].astype(object).to_numpy()
+        for room_type in pd.unique(room_types):
+            rows = np.flatnonzero(room_types == room_type)
+            self._build(room_type, coords[rows], rows)
+        # Approximate memory held by the listings copy and the BallTrees.
+        self.nbytes = int(clean.memory_usage(deep=True).sum()) + sum(
+            sum(array.nbytes for array in tree.get_arrays()) + self._rows[key].nbytes
+            for key, tree in self._trees.items()
+        )
+
+    def _build(self, key, coords, rows):
+        if len(rows):
+            self._trees[key] = BallTree(coords, metric="haversine")
+            self._rows[key] = rows
+
+    def query(self, latitude, longitude, room_type=None, k=DEFAULT_K, radius_km=DEFAULT_RADIUS_KM):
+        """
+        The ``k`` nearest listings of ``room_type`` (any type if None)
+        within ``radius_km`` of the coordinate.
+        """
+        tree = self._trees.get(room_type)
+        if tree is None:
+            return CompsResult(self.listings.iloc[0:0].assign(distance_km=[]))
+        point = np.radians([[latitude, longitude]])
+        distances, positions = tree.query(point, k=min(k, len(self._rows[room_type])))
+        distances_km = distances[0] * EARTH_RADIUS_KM
+        keep = distances_km <= radius_km
+        rows = self._rows[room_type][positions[0][keep]]
+        comps = self.listings.iloc[rows].assign(distance_km=distances_km[keep])
+        return CompsResult(comps.reset_index(drop=True))
@@ -0,0 +1,183 @@
+"""
+Per-session chat history for the advisor.
+
+``Conversation`` renders each message's HTML once, when it is added, and
+the app shows only the newest ``page_messages`` of them, with a button to
+page back through older ones.  Older turns are folded into a rolling
+extractive summary (each question plus the first sentence of its answer)
+once the verbatim turns outgrow the model's history budget.  Folded
+messages beyond ``max_messages`` are dropped, so a session's memory stays
+bounded.  ``model_history`` returns the summary and the newest turns as
+chat messages that fit ``CHAT_HISTORY_TOKENS``.
+"""
+import base64
+import html
+import os
+import re
+from functools import lru_cache
+
+from prompt_context import count_tokens
+
+DEFAULT_PAGE_MESSAGES = 20
+DEFAULT_MAX_MESSAGES = 200
+DEFAULT_HISTORY_TOKENS = 600
+# Share of the history budget the rolling summary may use.
+SUMMARY_SHARE = 0.4
+SUMMARY_QUESTION_CHARS = 160
+SUMMARY_ANSWER_CHARS = 240
+
+ROBOT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "robot_pet.png")
+
+USER_STYLE = (
+    "text-align: right; background-color:mistyrose; padding: 10px; "
+    "border-radius: 10px; margin-bottom: 10px; margin-left: 75%;"
+)
+ASSISTANT_STYLE = "flex: 1; background-color:#E1F5FE; padding: 10px; border-radius: 10px;"
+
+
+def history_tokens():
+    return int(os.getenv("CHAT_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS))
+
+
+@lru_cache(maxsize=1)
+def avatar_css():
+    """
+    Style block defining the ``robot-avatar`` class; the image is read and
+    encoded once per process and sent once per page, not once per message.
+    """
+    with open(ROBOT_IMAGE, "rb") as fh:
+        encoded = base64.b64encode(fh.read()).decode("ascii")
+    return (
+        "<style>.robot-avatar {"
+        "flex: 0 0 44px; height: 44px; border-radius: 6px; background-size: cover; "
+        f"background-image: url(data:image/png;base64,{encoded});"
+        "}</style>"
+    )
+
+
+def user_html(text):
+    return f"<div style='{USER_STYLE}'>{text}</div>"
+
+
+def assistant_html(text):
+    return (
+        "<div style='display: flex; gap: 10px; margin-bottom: 10px;'>"
+        f"<div class='robot-avatar'></div><div style='{ASSISTANT_STYLE}'>{text}</div></div>"
+    )
+
+
+def _first_sentence(text, limit):
+    plain = re.sub(r"[*_`#>|]+", "", html.unescape(re.sub(r"<[^>]+>", " ", text)))
+    plain = " ".join(plain.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", plain)
+    sentence = match.group(1) if match else plain
+    return sentence if len(sentence) <= limit else sentence[: limit - 1].rstrip() + "…"
+
+
+class Conversation:
+    """
+    Bounded message store with cached rendering and a rolling summary.
+    """
+
+    def __init__(self, page_messages=DEFAULT_PAGE_MESSAGES, max_messages=DEFAULT_MAX_MESSAGES, token_budget=None):
+        self.page_messages = page_messages
+        self.max_messages = max_messages
+        self.token_budget = history_tokens() if token_budget is None else token_budget
+        self.messages = []
+        # messages[:_folded] are represented in the summary.
+        self._folded = 0
+        self._summary_lines = []
+        self.summarized_turns = 0
+        self.dropped_messages = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add(self, role, content):
+        """
+        Append a message, rendering its HTML once.
+        """
+        render = user_html if role == "user" else assistant_html
+        self.messages.append({
+            "role": role,
+            "content": content,
+            "html": render(content),
+            "tokens": count_tokens(content),
+        })
+        self._roll()
+
+    # ---- display ----
+    def visible(self, pages=1):
+        """
+        The newest ``pages`` pages of messages, oldest first.
+        """
+        return self.messages[-pages * self.page_messages:]
+
+    def has_earlier(self, pages=1):
+        return len(self.messages) > pages * self.page_messages
+
+    # ---- model context ----
+    @property
+    def summary(self):
+        if not self._summary_lines:
+            return ""
+        omitted = self.summarized_turns - len(self._summary_lines)
+        header = f"({omitted} earlier turns omitted)\n" if omitted else ""
+        return header + "\n".join(self._summary_lines)
+
+    def model_history(self):
+        """
+        Chat messages for the next completion: the summary of older turns
+        (as a system message) followed by as many of the newest turns as
+        fit the token budget.
+        """
+        history = []
+        used = 0
+        summary = self.summary
+        if summary:
+            summary = f"Summary of the earlier conversation:\n{summary}"
+            used = count_tokens(summary)
+        for message in reversed(self.messages[self._folded:]):
+            used += message["tokens"]
+            if used > self.token_budget:
+                break
+            history.append({"role": message["role"], "content": message["content"]})
+        history.reverse()
+        if summary:
+            history.insert(0, {"role": "system", "content": summary})
+        return history
+
+    def _verbatim_tokens(self):
+        return sum(m["tokens"] for m in self.messages[self._folded:])
+
+    def _roll(self):
+        # Fold whole turns (question + answer) until the verbatim tail fits
+        # next to the summary, always keeping the newest message verbatim.
+        verbatim_budget = self.token_budget * (1 - SUMMARY_SHARE)
+        while self._verbatim_tokens() > verbatim_budget and self._folded < len(self.messages) - 1:
+            self._fold_turn()
+
+        summary_budget = self.token_budget * SUMMARY_SHARE
+        while len(self._summary_lines) > 1 and count_tokens(self.summary) > summary_budget:
+            self._summary_lines.pop(0)
+
+        excess = len(self.messages) - self.max_messages
+        if excess > 0:
+            excess = min(excess, self._folded)
+            del self.messages[:excess]
+            self._folded -= excess
+            self.dropped_messages += excess
+
+    def _fold_turn(self):
+        message = self.messages[self._folded]
+        self._folded += 1
+        if message["role"] != "user":
+            line = f"- Advisor: {_first_sentence(message['content'], SUMMARY_ANSWER_CHARS)}"
+        else:
+            line = f"- User asked: {_first_sentence(message['content'], SUMMARY_QUESTION_CHARS)}"
+            if self._folded < len(self.messages) - 1 and self.messages[self._folded]["role"] == "assistant":
+                answer = self.messages[self._folded]
+                self._folded += 1
+                line += f" Advisor: {_first_sentence(answer['content'], SUMMARY_ANSWER_CHARS)}"
+        self._summary_lines.append(line)
+        self.summarized_turns += 1
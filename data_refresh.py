@@ -0,0 +1,268 @@
+"""
+Hot refresh of city listings from new Inside Airbnb snapshots.
+
+A city can name a ``snapshots`` directory in ``cities.toml``.  The
+``SnapshotWatcher`` watches those directories; once a new ``.csv`` or
+``.csv.gz`` file stops changing, ``apply_snapshot`` loads it through the
+columnar cache and diffs it against the listings being served, by listing
+id.  Only the neighbourhood/room_type pairs touched by added, removed or
+changed listings are re-aggregated (``aggregates.update_aggregates``), and
+the new CityDataset is swapped into the registry in one step.  Sessions
+pick the new data up on their next rerun; nothing is restarted.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import aggregates
+import datasets
+import metrics
+import startup_bundle
+from city_registry import CityDataset
+
+SNAPSHOT_PATTERNS = ("*.csv", "*.csv.gz")
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# A listing counts as changed when any column the aggregates read differs:
+# its group, its price, or the inputs of the occupancy estimate.
+DIFF_COLUMNS = ["neighbourhood", "room_type", "price", "minimum_nights", "number_of_reviews_ltm"]
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_enabled():
+    """
+    Watching is on unless DATA_REFRESH is set to 0/false/no.
+    """
+    return os.getenv("DATA_REFRESH", "1").strip().lower() not in ("0", "false", "no")
+
+
+class SnapshotDiff:
+    """
+    What changed between two snapshots of a city's listings.
+    """
+
+    def __init__(self, added, removed, changed, changed_pairs, full=False):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.changed_pairs = changed_pairs
+        self.full = full
+
+    def as_dict(self):
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "changed": self.changed,
+            "pairs": len(self.changed_pairs),
+            "full": self.full,
+        }
+
+
+def _pairs(df):
+    keys = df[["neighbourhood", "room_type"]].astype(object).drop_duplicates()
+    return set(keys.itertuples(index=False, name=None))
+
+
+def _differs(old, new):
+    """
+    Element-wise ``old != new`` where two missing values count as equal.
+    """
+    if isinstance(old.dtype, pd.CategoricalDtype) or isinstance(new.dtype, pd.CategoricalDtype):
+        old, new = old.astype(object), new.astype(object)
+    old, new = old.to_numpy(), new.to_numpy()
+    return ~((old == new) | (pd.isna(old) & pd.isna(new)))
+
+
+def diff_snapshots(old, new):
+    """
+    Diff two listings frames by ``id``.
+
+    ``changed_pairs`` holds every (neighbourhood, room_type) whose listings
+    differ: the pairs of added and removed listings, and both the old and
+    the new pair of changed ones.  Snapshots with duplicate ids or with
+    different occupancy columns can't be matched row by row, so every pair
+    is reported and the result is marked ``full``.
+    """
+    columns = [col for col in DIFF_COLUMNS if col in old and col in new]
+    comparable = (
+        old["id"].is_unique and new["id"].is_unique
+        and [col for col in DIFF_COLUMNS if col in old] == [col for col in DIFF_COLUMNS if col in new]
+    )
+    if not comparable:
+        return SnapshotDiff(len(new), len(old), 0, _pairs(old) | _pairs(new), full=True)
+
+    old_rows = old.set_index("id")[columns]
+    new_rows = new.set_index("id")[columns]
+    added = new_rows.index.difference(old_rows.index)
+    removed = old_rows.index.difference(new_rows.index)
+    common = new_rows.index.intersection(old_rows.index)
+    before, after = old_rows.loc[common], new_rows.loc[common]
+    changed = np.zeros(len(common), dtype=bool)
+    for col in columns:
+        changed |= _differs(before[col], after[col])
+
+    changed_pairs = (
+        _pairs(new_rows.loc[added]) | _pairs(old_rows.loc[removed])
+        | _pairs(before[changed]) | _pairs(after[changed])
+    )
+    return SnapshotDiff(len(added), len(removed), int(changed.sum()), changed_pairs)
+
+
+def apply_snapshot(registry, city, csv_path):
+    """
+    Serve ``city`` from the snapshot at ``csv_path``.
+
+    If the city is in memory its aggregates are patched from the diff and
+    the new dataset is swapped in; otherwise the registry just switches
+    files and loads the snapshot on first use.  Returns the SnapshotDiff,
+    or None when nothing was loaded.
+    """
+    started = time.perf_counter()
+    current = registry.loaded(city)
+    if current is None:
+        registry.swap(city, csv_path)
+        metrics.DATA_REFRESHES.inc(city=city, status="switched")
+        logger.info("city %s now served from %s", city, csv_path)
+        return None
+
+    df = datasets.load_listings(csv_path)
+    if df is current.df:
+        return None
+    diff = diff_snapshots(current.df, df)
+    cube = aggregates.update_aggregates(current.aggregates.cube, df, diff.changed_pairs)
+    aggregates.save_aggregates(csv_path, cube)
+    dataset = CityDataset(city, registry.city_config(city), df, csv_path, aggregates.CityAggregates(cube))
+    registry.swap(city, csv_path, dataset)
+    # So the next cold start opens the new snapshot from its bundle.
+    startup_bundle.write_bundle(dataset)
+    metrics.DATA_REFRESHES.inc(city=city, status="applied")
+    logger.info(
+        "city %s refreshed from %s in %.2fs: %s",
+        city, csv_path, time.perf_counter() - started, diff.as_dict(),
+    )
+    return diff
+
+
+def _is_snapshot(path):
+    name = os.path.basename(path)
+    return not name.startswith(".") and name.endswith((".csv", ".csv.gz"))
+
+
+def latest_snapshot(directory):
+    """
+    Most recently modified snapshot file in ``directory``, or None.
+    """
+    paths = [path for pattern in SNAPSHOT_PATTERNS for path in glob.glob(os.path.join(directory, pattern))]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+class SnapshotWatcher(FileSystemEventHandler):
+    """
+    Applies new snapshots dropped into each city's ``snapshots`` directory.
+
+    Files are written over seconds, so a snapshot is applied only once it
+    has had no events for ``settle_seconds``.  Snapshots are applied one at
+    a time, in a background thread.
+    """
+
+    def __init__(self, registry, settle_seconds=DEFAULT_SETTLE_SECONDS):
+        super().__init__()
+        self.registry = registry
+        self.settle_seconds = settle_seconds
+        self.directories = {}
+        for city in registry.city_names():
+            directory = registry.snapshot_dir(city)
+            if directory is not None:
+                self.directories[os.path.abspath(directory)] = city
+        self._timers = {}
+        self._lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._observer = None
+
+    def start(self):
+        """
+        Catch up on snapshots already present, then start watching.
+        """
+        self._observer = Observer()
+        self._observer.daemon = True
+        for directory, city in self.directories.items():
+            os.makedirs(directory, exist_ok=True)
+            latest = latest_snapshot(directory)
+            if latest is not None:
+                self._schedule(city, latest, delay=0)
+            self._observer.schedule(self, directory, recursive=False)
+        self._observer.start()
+
+    def stop(self):
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def on_created(self, event):
+        self._on_event(event.src_path, event.is_directory)
+
+    def on_modified(self, event):
+        self._on_event(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self._on_event(event.dest_path, event.is_directory)
+
+    def _on_event(self, path, is_directory):
+        city = self.directories.get(os.path.dirname(os.path.abspath(path)))
+        if city is not None and not is_directory and _is_snapshot(path):
+            self._schedule(city, path, self.settle_seconds)
+
+    def _schedule(self, city, path, delay):
+        # A newer event for the same city replaces the pending one.
+        with self._lock:
+            pending = self._timers.pop(city, None)
+            if pending is not None:
+                pending.cancel()
+            timer = threading.Timer(delay, self._apply, (city, path))
+            timer.daemon = True
+            self._timers[city] = timer
+            timer.start()
+
+    def _apply(self, city, path):
+        with self._lock:
+            if self._timers.get(city) is threading.current_thread():
+                del self._timers[city]
+        with self._apply_lock:
+            try:
+                apply_snapshot(self.registry, city, path)
+            except Exception:
+                metrics.DATA_REFRESHES.inc(city=city, status="failed")
+                logger.exception("could not apply snapshot %s for %s", path, city)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_watcher(registry):
+    """
+    Start the process-wide SnapshotWatcher once (see DATA_REFRESH and
+    DATA_REFRESH_SETTLE_SECONDS).
+    """
+    global _watcher
+    if _watcher is None and refresh_enabled():
+        with _watcher_lock:
+            if _watcher is None:
+                settle = float(os.getenv("DATA_REFRESH_SETTLE_SECONDS", DEFAULT_SETTLE_SECONDS))
+                watcher = SnapshotWatcher(registry, settle)
+                if watcher.directories:
+                    watcher.start()
+                _watcher = watcher
+    return _watcher
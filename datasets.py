@@ -0,0 +1,280 @@
+"""
+Dataset layer for the Inside Airbnb city listings.
+
+Each city CSV is converted once into a compressed Parquet file under
+``files/cache`` and every later load is served from that file.  The Parquet
+copy is rebuilt only when the source CSV changes (size/mtime first, then a
+content hash), and loaded frames are kept in a process-wide cache so a
+Streamlit rerun only pays for an ``os.stat`` call.
+
+Only the columns the app uses are read (see ``LISTINGS_SCHEMA`` and
+``OPTIONAL_COLUMNS``): text columns become categoricals, numbers float32,
+and prices are parsed from their currency-formatted strings once, at ingest.
+Both the summary ``listings.csv`` and the detailed ``listings.csv.gz`` are
+accepted (see ``SOURCE_COLUMNS``).
+"""
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "files", "cache")
+PARQUET_COMPRESSION = "zstd"
+
+# Column -> dtype for everything the app reads from a listings file.
+# "price" is a marker for currency strings such as "$1,234.00".
+LISTINGS_SCHEMA = {
+    "id": "int64",
+    "neighbourhood": "category",
+    "room_type": "category",
+    "price": "price",
+    "latitude": "float32",
+    "longitude": "float32",
+}
+# Model features, read when the file has them.  The summary listings.csv
+# has the review/availability columns; the detailed one adds capacity.
+OPTIONAL_COLUMNS = {
+    "accommodates": "float32",
+    "bedrooms": "float32",
+    "beds": "float32",
+    "minimum_nights": "float32",
+    "number_of_reviews": "float32",
+    "number_of_reviews_ltm": "float32",
+    "reviews_per_month": "float32",
+    "calculated_host_listings_count": "float32",
+    "availability_365": "float32",
+}
+# Columns read from another source column when the file has it.  In the
+# detailed listings.csv.gz, "neighbourhood" is the host's free text and the
+# official area is "neighbourhood_cleansed".
+SOURCE_COLUMNS = {"neighbourhood": "neighbourhood_cleansed"}
+# Bump whenever the schema or the parsing rules change so existing
+# Parquet caches are rebuilt.
+SCHEMA_VERSION = 4
+
+_frames = {}
+_lock = threading.Lock()
+
+
+def _source_stat(csv_path):
+    """
+    Cheap fingerprint of the source CSV (size and modification time).
+    """
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_stem(csv_path):
+    """
+    Name under which files derived from ``csv_path`` are cached.
+
+    Files outside the app directory (e.g. snapshots under a per-city
+    folder, which often share a name such as ``listings.csv.gz``) are
+    prefixed with their folder name.
+    """
+    csv_path = os.path.abspath(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    parent = os.path.dirname(csv_path)
+    if parent != BASE_DIR:
+        stem = f"{os.path.basename(parent)}.{stem}"
+    return stem
+
+
+def cache_paths(csv_path, cache_dir=CACHE_DIR):
+    """
+    Return the (parquet, metadata) paths used to cache ``csv_path``.
+    """
+    stem = cache_stem(csv_path)
+    return (
+        os.path.join(cache_dir, f"{stem}.parquet"),
+        os.path.join(cache_dir, f"{stem}.meta.json"),
+    )
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_path, meta_path)
+
+
+def parse_price(values):
+    """
+    Turn a price column (numbers or strings like "£1,234.00") into float32.
+
+    Anything that can't be parsed becomes NaN.
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(str).str.replace(r"[^0-9.\-]", "", regex=True)
+    return pd.to_numeric(values, errors="coerce").astype("float32")
+
+
+def read_listings_csv(csv_path, schema=LISTINGS_SCHEMA, optional=OPTIONAL_COLUMNS):
+    """
+    Read only the schema columns of a listings CSV, with compact dtypes.
+
+    Every ``schema`` column (or its ``SOURCE_COLUMNS`` replacement) must be
+    present; ``optional`` columns are kept when the file has them.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = {**schema, **{col: dtype for col, dtype in optional.items() if col in header}}
+    sources = {col: source for col, source in SOURCE_COLUMNS.items() if col in columns and source in header}
+    dtypes = {col: dtype for col, dtype in columns.items() if dtype not in ("price", "float32")}
+    price_cols = [col for col, dtype in columns.items() if dtype == "price"]
+    read_dtypes = {**dtypes, **{col: str for col in price_cols}}
+    df = pd.read_csv(
+        csv_path,
+        usecols=[sources.get(col, col) for col in columns],
+        dtype={sources.get(col, col): dtype for col, dtype in read_dtypes.items()},
+    ).rename(columns={source: col for col, source in sources.items()})
+    for col in price_cols:
+        df[col] = parse_price(df[col])
+    for col, dtype in columns.items():
+        if dtype == "float32":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    return df[list(columns)]
+
+
+def memory_report(csv_path):
+    """
+    Deep memory use of ``csv_path`` loaded naively vs. through the schema.
+
+    Returns a dict of byte counts: ``raw`` (every column, default dtypes)
+    and ``compact`` (``read_listings_csv``).
+    """
+    raw = pd.read_csv(csv_path)
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    del raw
+    compact = read_listings_csv(csv_path)
+    return {"raw": raw_bytes, "compact": int(compact.memory_usage(deep=True).sum())}
+
+
+def build_columnar_cache(csv_path, cache_dir=CACHE_DIR):
+    """
+    Convert ``csv_path`` to Parquet and record the source fingerprint.
+
+    Returns the parsed DataFrame so callers don't have to read it back.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, meta_path = cache_paths(csv_path, cache_dir)
+
+    stat = _source_stat(csv_path)
+    df = read_listings_csv(csv_path)
+
+    tmp_path = parquet_path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression=PARQUET_COMPRESSION, index=False)
+    os.replace(tmp_path, parquet_path)
+    _write_meta(meta_path, {**stat, "sha256": _file_hash(csv_path), "schema": SCHEMA_VERSION})
+    return df
+
+
+def _cache_is_fresh(csv_path, parquet_path, meta_path, stat):
+    """
+    Check the Parquet copy against the source, refreshing the metadata when
+    only the mtime moved but the content is unchanged.
+    """
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(parquet_path):
+        return False
+    if meta.get("schema") != SCHEMA_VERSION:
+        return False
+    if meta.get("size") == stat["size"] and meta.get("mtime_ns") == stat["mtime_ns"]:
+        return True
+    if meta.get("size") != stat["size"]:
+        return False
+    if meta.get("sha256") != _file_hash(csv_path):
+        return False
+    _write_meta(meta_path, {**meta, **stat})
+    return True
+
+
+def data_version(csv_path, cache_dir=CACHE_DIR):
+    """
+    Identifier of the cached data for ``csv_path``: source hash plus schema.
+
+    Anything derived from a city's listings (aggregates, indexes, ...) is
+    keyed on this so it is rebuilt exactly when the data changes.
+    """
+    _, meta_path = cache_paths(os.path.abspath(csv_path), cache_dir)
+    meta = _read_meta(meta_path) or {}
+    return f"{meta.get('sha256', 'unknown')[:16]}-s{meta.get('schema', 0)}"
+
+
+def cached_version(csv_path, cache_dir=CACHE_DIR):
+    """
+    ``data_version`` of ``csv_path`` if its Parquet cache is up to date,
+    else None.  Reads only the metadata (and hashes the source if its mtime
+    moved), never the listings.
+    """
+    key = os.path.abspath(csv_path)
+    parquet_path, meta_path = cache_paths(key, cache_dir)
+    if not _cache_is_fresh(key, parquet_path, meta_path, _source_stat(key)):
+        return None
+    return data_version(key, cache_dir)
+
+
+def load_listings(csv_path, cache_dir=CACHE_DIR):
+    """
+    Load a city listings file through the columnar cache.
+
+    The returned DataFrame is shared by every caller in the process and must
+    be treated as read-only.
+    """
+    key = os.path.abspath(csv_path)
+    stat = _source_stat(key)
+
+    cached = _frames.get(key)
+    if cached is not None and cached[0] == stat:
+        return cached[1]
+
+    with _lock:
+        cached = _frames.get(key)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+
+        parquet_path, meta_path = cache_paths(key, cache_dir)
+        if _cache_is_fresh(key, parquet_path, meta_path, stat):
+            df = pd.read_parquet(parquet_path, engine="pyarrow")
+        else:
+            df = build_columnar_cache(key, cache_dir)
+
+        _frames[key] = (stat, df)
+        return df
+
+
+def evict(csv_path):
+    """
+    Drop one file's DataFrame from the process-wide cache.
+    """
+    with _lock:
+        _frames.pop(os.path.abspath(csv_path), None)
+
+
+def clear_memory_cache():
+    """
+    Drop every DataFrame held by the process-wide cache.
+    """
+    with _lock:
+        _frames.clear()
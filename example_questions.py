@@ -0,0 +1,73 @@
+"""
+Example questions shown in the "Example Questions for <City>" expanders.
+
+Kept as data so the same list can pre-warm the LLM response cache
+(see prewarm_cache.py).
+"""
+from html import escape
+
+EXAMPLE_QUESTIONS = {
+    "London": [
+        ("🏡 Neighborhood & Market Analysis (London):", [
+            "Which neighborhood in London has the highest Airbnb occupancy rate?",
+            "What are the best areas in London for Airbnb investment in 2025?",
+            "How do occupancy rates compare between Shoreditch, Soho, and Camden?",
+        ]),
+        ("💰 Financial & ROI Analysis:", [
+            "What is the expected ROI for a £500,000 property in London?",
+            "How long does it take to recover my investment for an Airbnb in Westminster?",
+            "How do property taxes and maintenance costs impact Airbnb profitability in London?",
+        ]),
+        ("🔍 Personalized Investment Recommendations:", [
+            "I have a £750,000 budget. Which area in London offers the best Airbnb returns?",
+            "Is it better to invest in a studio or a two-bedroom apartment for Airbnb in London?",
+            "Which neighborhoods in London offer the best balance between affordability and high demand?",
+        ]),
+        ("⚠️ Regulation & Legal Checks:", [
+            "Are there any short-term rental restrictions in Westminster?",
+            "Can I legally list my property as an Airbnb in central London?",
+        ]),
+    ],
+    "Paris": [
+        ("🏡 Neighborhood & Market Analysis (Paris):", [
+            "Which arrondissement in Paris has the highest Airbnb occupancy rate?",
+            "What are the best areas in Paris for Airbnb investment in 2025?",
+            "How do occupancy rates compare between Le Marais, Montmartre, and the Latin Quarter?",
+        ]),
+        ("💰 Financial & ROI Analysis:", [
+            "What is the expected ROI for a €600,000 apartment in Paris?",
+            "How long does it take to recover my investment for an Airbnb near the Eiffel Tower?",
+            "How do property taxes and maintenance costs impact Airbnb profitability in Paris?",
+        ]),
+        ("🔍 Personalized Investment Recommendations:", [
+            "I have a €750,000 budget. Which area in Paris offers the best Airbnb returns?",
+            "Is it better to invest in a studio or a two-bedroom apartment for Airbnb in Paris?",
+            "Which arrondissements in Paris offer the best balance between affordability and high demand?",
+        ]),
+        ("⚠️ Regulation & Legal Checks:", [
+            "Are there any short-term rental restrictions in central Paris?",
+            "Can I legally list my property as an Airbnb near the Champs-Élysées?",
+        ]),
+    ],
+}
+
+
+def questions_for_city(city):
+    """
+    Flat list of the example questions for ``city``.
+    """
+    return [q for _, questions in EXAMPLE_QUESTIONS.get(city, []) for q in questions]
+
+
+def example_questions_html(city):
+    """
+    HTML for the city's example-question expander ("" if it has none).
+    """
+    blocks = []
+    for title, questions in EXAMPLE_QUESTIONS.get(city, []):
+        items = "\n".join(f"    <li><em>'{escape(q, quote=False)}'</em></li>" for q in questions)
+        blocks.append(
+            f"<strong>{escape(title, quote=False)}</strong>\n"
+            f"<ul style='color:#333333; font-size:15px;'>\n{items}\n</ul>"
+        )
+    return "\n".join(blocks)
@@ -1,58 +1,57 @@
 import streamlit as st
-import openai
-import os
-from dotenv import load_dotenv
-import pickle
-import pandas as pd
+import toml
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Only what the login and landing pages need is imported up here.  The
+# data, model and LLM modules are imported in section 3 once a city is
+# selected, so neither page loads pandas, aiohttp or scikit-learn.
+import metrics
 
 ############################
-# 1) LOAD YOUR CSVs
+# 0) METRICS
 ############################
-df_london = pd.read_csv("london_listings.csv")
-df_paris = pd.read_csv("paris_listings.csv")  # Always load Paris CSV
+# Every script run is timed stage by stage (see metrics.py for the JSON
+# logs and Prometheus exports).
+metrics.configure_from_env()
+script_run_ctx = get_script_run_ctx()
+metrics.start_rerun(script_run_ctx.session_id if script_run_ctx else None)
 
-def generate_csv_summary(df, city_name):
-    """
-    Summarize the Airbnb CSV (by neighbourhood & room_type).
-    """
-    grouped = (
-        df.groupby(["neighbourhood", "room_type"])["price"]
-          .agg(["mean", "count"])
-          .reset_index()
-          .rename(columns={"mean": "avg_price", "count": "listings_count"})
-    )
-    lines = [f"Summary of {city_name} data (by neighbourhood & room_type):"]
-    for _, row in grouped.iterrows():
-        nb = row["neighbourhood"]
-        rt = row["room_type"]
-        avgp = row["avg_price"]
-        cnt = row["listings_count"]
-        lines.append(f"- {nb} / {rt}: Average Price = £{avgp:.2f}, Listings = {cnt}")
-    return "\n".join(lines)
-
-def get_df_for_city(city):
+
+def end_rerun(registry=None):
     """
-    Return the raw DataFrame for the chosen city.
+    Close this run's trace; with METRICS_DEBUG=1 or ?debug=1, show its
+    breakdown (and the cities loaded in ``registry``) in the sidebar.
     """
-    if city == "London":
-        return df_london
-    elif city == "Paris":
-        return df_paris
-    return None
+    trace = metrics.finish_rerun()
+    if trace is None or not (metrics.debug_enabled() or st.query_params.get("debug") == "1"):
+        return
+    with st.sidebar.expander("Debug: this rerun", expanded=True):
+        st.markdown(f"**Script run:** {trace.total * 1e3:.1f} ms")
+        spans = trace.as_dict()["spans"]
+        if spans:
+            import pandas as pd
+
+            breakdown = pd.DataFrame(spans)
+            breakdown["stage"] = ["  " * depth + stage for stage, depth in zip(breakdown["stage"], breakdown["depth"])]
+            st.dataframe(breakdown[["stage", "start_ms", "ms"]].round(1), hide_index=True)
+        for call in trace.llm_calls:
+            st.markdown(
+                f"**LLM** {call['model']}{' (cached)' if call['cached'] else ''}: "
+                f"{call['prompt_tokens']} prompt / {call['completion_tokens']} completion tokens, "
+                f"first token {call['ttft_s'] * 1e3:.0f} ms, total {call['total_s'] * 1e3:.0f} ms"
+            )
+        for city in registry.loaded_cities() if registry is not None else []:
+            loaded = registry.loaded(city)
+            st.caption(f"{city}: {loaded.rows:,} listings, {loaded.nbytes / 2**20:.1f} MB")
 
-############################
-# 2) LOAD OPENAI KEY
-############################
-load_dotenv("OPEN_API_KEY.env")
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 ############################
-# 3) PAGE CONFIG
+# 1) PAGE CONFIG
 ############################
 st.set_page_config(page_title="Airbnb Investment Advisor", page_icon="🏡", layout="wide")
 
 ############################
-# 4) AUTHENTICATION
+# 2) AUTHENTICATION
 ############################
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
@@ -86,17 +85,18 @@ if not st.session_state.authenticated:
                 st.rerun()
             else:
                 st.error("❌ Invalid username or password.")
+    end_rerun()
     st.stop()
 
 ############################
-# 5) AFTER AUTH
+# 3) AFTER AUTH
 ############################
 else:
     # Sidebar
     st.sidebar.success(f"✅ You're logged in as {st.session_state.username}")
     if st.sidebar.button("LOG OUT"):
         st.session_state.authenticated = False
-        for key in ["city_selected", "messages", "question_asked", "csv_summary", "csv_info", "show_map"]:
+        for key in ["city_selected", "conversation", "chat_pages", "question_asked", "csv_summary", "csv_info", "data_version", "show_map"]:
             st.session_state.pop(key, None)
         st.rerun()
 
@@ -107,11 +107,14 @@ else:
     if "city_selected" not in st.session_state:
         st.session_state.city_selected = None
 
+    # Only the names are needed here, so cities.toml is read directly instead
+    # of through city_registry (which imports the data stack).
+    city_options = ["None"] + list(toml.load("cities.toml").get("cities", {}))
     chosen_city = st.sidebar.selectbox(
         "",
-        options=["None", "London", "Paris"],
-        index=0 if st.session_state.city_selected is None else (
-            1 if st.session_state.city_selected == "London" else 2
+        options=city_options,
+        index=0 if st.session_state.city_selected not in city_options else (
+            city_options.index(st.session_state.city_selected)
         )
     )
 
@@ -127,48 +130,136 @@ else:
     else:
         if chosen_city != st.session_state.city_selected:
             st.session_state.city_selected = chosen_city
-            for key in ["messages", "question_asked", "csv_summary", "csv_info", "show_map"]:
+            for key in ["conversation", "chat_pages", "question_asked", "csv_summary", "csv_info", "data_version", "show_map"]:
                 st.session_state.pop(key, None)
             st.rerun()
 
-    # Load data if city chosen
-    df_current = get_df_for_city(st.session_state.city_selected)
-
-    # Generate summary once
-    if df_current is not None and "csv_summary" not in st.session_state:
-        summary_text = generate_csv_summary(df_current, st.session_state.city_selected)
+    # Load data if city chosen.  The data, model and LLM modules are only
+    # imported from here on, so the landing page stays as light as login.
+    city_registry = city_data = city_aggregates = None
+    if st.session_state.city_selected is not None:
+        from dotenv import load_dotenv
+
+        import chat
+        import conversation
+        import data_refresh
+        import llm_cache
+        import map_data
+        import pricing
+        import roi_simulator
+        from city_registry import get_registry
+        from example_questions import example_questions_html
+        from llm_client import LLMClientError
+
+        # Cities come from cities.toml. Each one is loaded the first time a
+        # user selects it (from its startup bundle when there is one, see
+        # startup_bundle.py) and is shared by all sessions in this process.
+        # New listings snapshots are picked up in the background (see
+        # data_refresh.py).
+        city_registry = get_registry()
+        data_refresh.start_watcher(city_registry)
+
+        load_dotenv("OPEN_API_KEY.env")
+        chat.configure_client()
+
+        with metrics.span("city_load"):
+            city_data = city_registry.get(st.session_state.city_selected)
+            city_aggregates = city_data.aggregates if city_data is not None else None
+
+    # Generate summary once per data version (a refresh swaps in a new one)
+    if city_data is not None and st.session_state.get("data_version") != city_data.version:
+        st.session_state["data_version"] = city_data.version
+        st.session_state.pop("csv_summary", None)
+    if city_aggregates is not None and "csv_summary" not in st.session_state:
+        with metrics.span("summary"):
+            summary_text = city_aggregates.summary_text(st.session_state.city_selected)
         st.session_state["csv_summary"] = summary_text
 
     # ---- PROPERTY DETAILS WITH EXPANDER ----
-    if df_current is not None:
+    if city_aggregates is not None:
         with st.sidebar.expander("Enter Property Details (Optional)", expanded=False):
-            possible_neighborhoods = sorted(df_current["neighbourhood"].dropna().unique())
-            possible_room_types = sorted(df_current["room_type"].dropna().unique())
+            possible_neighborhoods = city_aggregates.neighbourhoods
+            possible_room_types = city_aggregates.room_types
 
             selected_neighborhood = st.selectbox("Neighborhood", possible_neighborhoods)
             selected_room_type = st.selectbox("Property Type", possible_room_types)
 
-            if st.button("Get Insights"):
-                df_filtered = df_current[
-                    (df_current["neighbourhood"] == selected_neighborhood)
-                    & (df_current["room_type"] == selected_room_type)
-                ]
-                if not df_filtered.empty:
-                    average_price = df_filtered["price"].mean()
-                else:
-                    average_price = df_current["price"].mean()
+            purchase_price = st.number_input("Purchase Price (£)", min_value=1_000.0, value=500_000.0, step=10_000.0)
+            deposit_pct = st.slider("Deposit (%)", 0, 100, 25)
+            mortgage_rate_pct = st.number_input("Mortgage Rate (%)", min_value=0.0, value=5.0, step=0.25)
+            monthly_costs = st.number_input(
+                "Monthly Running Costs (£)", min_value=0.0, value=600.0, step=50.0,
+                help="Service charge, insurance, utilities, maintenance and local taxes.",
+            )
 
-                predicted_price = average_price
-                monthly_revenue = predicted_price * 20
+            if st.button("Get Insights"):
+                # Market stats, the city's trained model (see train_model.py) when
+                # there is one, and the ROI simulation; score_portfolio.py runs
+                # the same code over whole candidate files.
+                import price_model
+
+                with metrics.span("insights"):
+                    insight = pricing.estimate_property(
+                        city_aggregates,
+                        price_model.get_predictor(st.session_state.city_selected),
+                        selected_neighborhood,
+                        selected_room_type,
+                        roi_simulator.PropertyInputs(
+                            purchase_price=purchase_price,
+                            deposit_pct=deposit_pct,
+                            mortgage_rate_pct=mortgage_rate_pct,
+                            monthly_costs=monthly_costs,
+                        ),
+                    )
+                predicted_price = insight.predicted_price
+                simulation = insight.simulation
+                monthly_revenue = simulation.monthly_revenue[50]
+                break_even = simulation.break_even_months[50]
 
                 st.sidebar.success(f"**Estimated Nightly Price:** £{predicted_price:.2f}")
                 st.sidebar.info(f"**Estimated Monthly Revenue:** £{monthly_revenue:.2f}")
-
-                st.session_state["csv_info"] = (
-                    f"For neighborhood '{selected_neighborhood}' and property type '{selected_room_type}', "
-                    f"the average nightly price is £{predicted_price:.2f}. Estimated monthly revenue is £{monthly_revenue:.2f}."
+                st.sidebar.info(
+                    f"**Annual ROI:** {simulation.roi_pct[50]:.1f}% "
+                    f"(p10 {simulation.roi_pct[10]:.1f}% – p90 {simulation.roi_pct[90]:.1f}%)  \n"
+                    f"**Break-even:** "
+                    + (f"{break_even:.0f} months" if break_even != float("inf")
+                       else f"not within {simulation.horizon_months} months")
+                    + f" ({simulation.break_even_probability:.0%} of scenarios break even)"
                 )
 
+                st.session_state["csv_info"] = insight.csv_info()
+
+    # ---- NEARBY COMPARABLES FOR AN ADDRESS COORDINATE ----
+    if city_data is not None:
+        with st.sidebar.expander("Nearby Comparable Listings (Optional)", expanded=False):
+            map_center = city_data.map_data.center or {"lat": 0.0, "lon": 0.0}
+            comps_lat = st.number_input("Latitude", value=map_center["lat"], format="%.5f", key="comps_lat")
+            comps_lon = st.number_input("Longitude", value=map_center["lon"], format="%.5f", key="comps_lon")
+            comps_room_type = st.selectbox("Property Type", city_aggregates.room_types, key="comps_room_type")
+            comps_radius = st.slider("Search radius (km)", 0.2, 5.0, 1.0, 0.1, key="comps_radius")
+
+            if st.button("Find Comparables"):
+                with metrics.span("comps"):
+                    comps_result = city_data.comps.query(
+                        comps_lat, comps_lon, comps_room_type, k=10, radius_km=comps_radius
+                    )
+                if comps_result.count:
+                    st.sidebar.success(
+                        f"**Comparable Nightly Price:** £{comps_result.weighted_mean:.2f} "
+                        f"(distance-weighted, {comps_result.count} listings within "
+                        f"{comps_result.max_distance_km:.2f} km)"
+                    )
+                    st.sidebar.info(
+                        f"**Typical Range:** £{comps_result.p10:.2f} – £{comps_result.p90:.2f} "
+                        f"(median £{comps_result.weighted_median:.2f})"
+                    )
+                    st.sidebar.dataframe(
+                        comps_result.comps[["neighbourhood", "price", "distance_km"]].round(2),
+                        hide_index=True,
+                    )
+                else:
+                    st.sidebar.warning(f"No {comps_room_type} listings within {comps_radius:.1f} km.")
+
     # MAIN CONTENT
     if st.session_state.city_selected is None:
         st.image("assets/airbnb_banner.png", use_container_width=True)
@@ -210,10 +301,8 @@ else:
         )
     else:
         # Show city-specific banner
-        if st.session_state.city_selected == "London":
-            st.image("assets/london_banner.png", use_container_width=True)
-        elif st.session_state.city_selected == "Paris":
-            st.image("assets/paris_banner.png", use_container_width=True)
+        if city_data.banner:
+            st.image(city_data.banner, use_container_width=True)
 
         st.title("Airbnb Smart Investment Chatbot")
         st.markdown(f"**Selected city:** {st.session_state.city_selected}")
@@ -222,52 +311,34 @@ else:
         if "show_map" not in st.session_state:
             st.session_state["show_map"] = False
 
-        import plotly.express as px
-
-        # Build a cleaned DataFrame for the map
-        if df_current is not None:
-            df_map = df_current.copy()
-            df_map["price"] = pd.to_numeric(df_map["price"], errors="coerce")
-            df_map.dropna(subset=["price", "latitude", "longitude"], inplace=True)
-
         # If show_map is True, show the map page
         if st.session_state["show_map"]:
             st.title(f"Interactive Map of {st.session_state.city_selected}")
 
-            fig = px.scatter_mapbox(
-                df_map,
-                lat="latitude",
-                lon="longitude",
-                color="price",
-                size="price",
-                color_continuous_scale=px.colors.cyclical.IceFire,
-                size_max=15,
-                zoom=10,
-                mapbox_style="carto-positron",
-                hover_name="neighbourhood",
-                hover_data={
-                    "price": True,
-                    "latitude": False,
-                    "longitude": False
-                },
-                title=(
-                    f"Interactive Map of {st.session_state.city_selected} Listings "
-                    "Colored by Average Price and Sized by Average Price"
-                )
+            # Listings are binned server-side below POINT_ZOOM_THRESHOLD so the
+            # browser never receives every point of a large city.
+            map_zoom = st.slider(
+                "Map detail (zoom level)", min_value=map_data.MIN_ZOOM, max_value=map_data.MAX_ZOOM, value=10,
+                help=f"Individual listings are shown from zoom {map_data.POINT_ZOOM_THRESHOLD}.",
             )
-            st.plotly_chart(fig)
+            with metrics.span("map_build"):
+                fig = map_data.build_figure(city_data.map_data, map_zoom, st.session_state.city_selected)
+                st.plotly_chart(fig)
 
             if st.button("Back to Chatbot"):
                 st.session_state["show_map"] = False
 
+            end_rerun(city_registry)
             st.stop()
 
-        # Light-Blue Buttons for "Explore London Map" or "Explore Paris Map"
+        # Light-Blue Buttons for the "Explore <City> Map" buttons
+        map_button_labels = [f"Explore {city} Map" for city in city_registry.city_names()]
+        map_button_selector = ",\n".join(f"button[aria-label='{label}']" for label in map_button_labels)
+        map_button_hover = ",\n".join(f"button[aria-label='{label}']:hover" for label in map_button_labels)
         st.markdown(
-            """
+            f"""
             <style>
-            button[aria-label='Explore London Map'],
-            button[aria-label='Explore Paris Map'] {
+            {map_button_selector} {{
                 background-color: #87CEFA !important; /* Light Blue */
                 color: white !important;
                 border: none !important;
@@ -275,177 +346,95 @@ else:
                 border-radius: 0.5rem !important;
                 cursor: pointer !important;
                 margin-top: 10px !important;
-            }
-            button[aria-label='Explore London Map']:hover,
-            button[aria-label='Explore Paris Map']:hover {
+            }}
+            {map_button_hover} {{
                 background-color: #00BFFF !important; /* Deep Sky Blue */
-            }
+            }}
             </style>
             """,
             unsafe_allow_html=True
         )
 
         # City-specific Explore Map button
-        if st.session_state.city_selected == "London":
-            if st.button("Explore London Map", key="explore_map_london"):
-                st.session_state["show_map"] = True
-        elif st.session_state.city_selected == "Paris":
-            if st.button("Explore Paris Map", key="explore_map_paris"):
-                st.session_state["show_map"] = True
+        city_key = st.session_state.city_selected.lower().replace(" ", "_")
+        if st.button(f"Explore {st.session_state.city_selected} Map", key=f"explore_map_{city_key}"):
+            st.session_state["show_map"] = True
 
         # Chatbot logic
         if "question_asked" not in st.session_state:
             st.session_state.question_asked = False
 
         if not st.session_state.question_asked:
-            if st.session_state.city_selected == "London":
-                with st.expander("Example Questions for London", expanded=False):
-                    st.markdown(
-                        """
-                        <strong>🏡 Neighborhood & Market Analysis (London):</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'Which neighborhood in London has the highest Airbnb occupancy rate?'</em></li>
-                            <li><em>'What are the best areas in London for Airbnb investment in 2025?'</em></li>
-                            <li><em>'How do occupancy rates compare between Shoreditch, Soho, and Camden?'</em></li>
-                        </ul>
-                        <strong>💰 Financial & ROI Analysis:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'What is the expected ROI for a £500,000 property in London?'</em></li>
-                            <li><em>'How long does it take to recover my investment for an Airbnb in Westminster?'</em></li>
-                            <li><em>'How do property taxes and maintenance costs impact Airbnb profitability in London?'</em></li>
-                        </ul>
-                        <strong>🔍 Personalized Investment Recommendations:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'I have a £750,000 budget. Which area in London offers the best Airbnb returns?'</em></li>
-                            <li><em>'Is it better to invest in a studio or a two-bedroom apartment for Airbnb in London?'</em></li>
-                            <li><em>'Which neighborhoods in London offer the best balance between affordability and high demand?'</em></li>
-                        </ul>
-                        <strong>⚠️ Regulation & Legal Checks:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'Are there any short-term rental restrictions in Westminster?'</em></li>
-                            <li><em>'Can I legally list my property as an Airbnb in central London?'</em></li>
-                        </ul>
-                        """,
-                        unsafe_allow_html=True
-                    )
-            else:  # Paris
-                with st.expander("Example Questions for Paris", expanded=False):
-                    st.markdown(
-                        """
-                        <strong>🏡 Neighborhood & Market Analysis (Paris):</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'Which arrondissement in Paris has the highest Airbnb occupancy rate?'</em></li>
-                            <li><em>'What are the best areas in Paris for Airbnb investment in 2025?'</em></li>
-                            <li><em>'How do occupancy rates compare between Le Marais, Montmartre, and the Latin Quarter?'</em></li>
-                        </ul>
-                        <strong>💰 Financial & ROI Analysis:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'What is the expected ROI for a €600,000 apartment in Paris?'</em></li>
-                            <li><em>'How long does it take to recover my investment for an Airbnb near the Eiffel Tower?'</em></li>
-                            <li><em>'How do property taxes and maintenance costs impact Airbnb profitability in Paris?'</em></li>
-                        </ul>
-                        <strong>🔍 Personalized Investment Recommendations:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'I have a €750,000 budget. Which area in Paris offers the best Airbnb returns?'</em></li>
-                            <li><em>'Is it better to invest in a studio or a two-bedroom apartment for Airbnb in Paris?'</em></li>
-                            <li><em>'Which arrondissements in Paris offer the best balance between affordability and high demand?'</em></li>
-                        </ul>
-                        <strong>⚠️ Regulation & Legal Checks:</strong>
-                        <ul style='color:#333333; font-size:15px;'>
-                            <li><em>'Are there any short-term rental restrictions in central Paris?'</em></li>
-                            <li><em>'Can I legally list my property as an Airbnb near the Champs-Élysées?'</em></li>
-                        </ul>
-                        """,
-                        unsafe_allow_html=True
-                    )
+            examples_html = example_questions_html(st.session_state.city_selected)
+            if examples_html:
+                with st.expander(f"Example Questions for {st.session_state.city_selected}", expanded=False):
+                    st.markdown(examples_html, unsafe_allow_html=True)
 
         if st.session_state.city_selected is not None:
-            if "messages" not in st.session_state:
-                st.session_state.messages = []
-
-            # Display chat history
-            for message in st.session_state.messages:
-                if message["role"] == "user":
-                    # Right-aligned, pink background
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.empty()
-                    with col2:
-                        st.markdown(
-                            f"<div style='text-align: right; "
-                            f"background-color:mistyrose; "
-                            f"padding: 10px; "
-                            f"border-radius: 10px; "
-                            f"margin-bottom: 10px;'>"
-                            f"{message['content']}</div>",
-                            unsafe_allow_html=True
-                        )
-                else:
-                    # Assistant (chatbot) message
-                    col1, col2 = st.columns([1, 15])
-                    with col1:
-                        st.image("assets/robot_pet.png", width=200)
-                    with col2:
-                        # Light blue background
-                        st.markdown(
-                            f"<div style='background-color:#E1F5FE; "
-                            f"padding: 10px; "
-                            f"border-radius: 10px; "
-                            f"margin-bottom: 10px;'>"
-                            f"{message['content']}</div>",
-                            unsafe_allow_html=True
-                        )
+            if "conversation" not in st.session_state:
+                st.session_state.conversation = conversation.Conversation()
+                st.session_state.chat_pages = 1
+            chat_history = st.session_state.conversation
+
+            # Display the newest page(s) of chat history; each message's HTML
+            # was rendered when it was added.
+            st.markdown(conversation.avatar_css(), unsafe_allow_html=True)
+            if chat_history.has_earlier(st.session_state.chat_pages):
+                if st.button("Load earlier messages", key="chat_load_earlier"):
+                    st.session_state.chat_pages += 1
+                    st.rerun()
+            elif chat_history.dropped_messages:
+                st.caption(f"{chat_history.dropped_messages} older messages are only kept as a summary.")
+            with metrics.span("chat_history"):
+                for message in chat_history.visible(st.session_state.chat_pages):
+                    st.markdown(message["html"], unsafe_allow_html=True)
 
             user_input = st.chat_input("Write here...")
 
-            def chat_with_gpt(prompt):
+            def chat_with_gpt(prompt, on_token=None):
                 city = st.session_state.city_selected
-                csv_summary = st.session_state.get("csv_summary", "")
+                # Only the neighbourhood/room type rows relevant to the question
+                # (within PROMPT_CONTEXT_TOKENS) instead of the whole summary.
+                csv_summary = city_data.context_index.select(prompt)
                 csv_info = st.session_state.get("csv_info", "")
 
-                system_message = (
-                    f"You are an Airbnb Investment Advisor for {city}.\n\n"
-                    f"Below is the summarized CSV data for all listings:\n{csv_summary}\n\n"
-                    f"Additionally, optional snippet: {csv_info}\n\n"
-                    "If the CSV does not have certain data (like occupancy rates), disclaim that Airbnb does not "
-                    "provide those data points in this dataset, but you can approximate from external sources "
-                    "using numeric or percentage-based insights. Always provide numeric or percentage-based data if possible. "
-                    "Be concise, professional, and directly to the point. Present key details and the final most important output in bold or bullet points."
-                )
-                response = openai.ChatCompletion.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": system_message},
-                        {"role": "user", "content": prompt}
-                    ]
+                content, timing = chat.answer_question(
+                    prompt,
+                    city,
+                    csv_summary,
+                    csv_info,
+                    model=chat.DEFAULT_MODEL,
+                    stream=on_token is not None,
+                    on_token=on_token,
+                    cache=llm_cache.get_cache(),
+                    # Earlier turns (newest verbatim, older ones summarized)
+                    # within CHAT_HISTORY_TOKENS.
+                    history=chat_history.model_history(),
                 )
-                return response["choices"][0]["message"]["content"]
+                st.session_state["last_chat_timing"] = timing.as_dict()
+                return content
 
             if user_input:
                 st.session_state.question_asked = True
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.empty()
-                with col2:
-                    st.markdown(
-                        f"<div style='text-align: right; background-color:mistyrose; "
-                        f"padding: 10px; border-radius: 10px; margin-bottom: 10px;'>"
-                        f"{user_input}</div>",
-                        unsafe_allow_html=True
-                    )
-                st.session_state.messages.append({"role": "user", "content": user_input})
-
-                response = chat_with_gpt(user_input)
-
-                col1, col2 = st.columns([1, 15])
-                with col1:
-                    st.image("assets/robot_pet.png", width=200)
-                with col2:
-                    st.markdown(
-                        f"<div style='background-color:#E1F5FE; padding: 10px; border-radius: 10px; margin-bottom: 10px;'>"
-                        f"{response}</div>",
-                        unsafe_allow_html=True
-                    )
+                st.markdown(conversation.user_html(user_input), unsafe_allow_html=True)
+                response_placeholder = st.empty()
+
+                def render_response(text):
+                    response_placeholder.markdown(conversation.assistant_html(text), unsafe_allow_html=True)
+
+                try:
+                    with metrics.span("llm_call"):
+                        response = chat_with_gpt(
+                            user_input, on_token=render_response if chat.streaming_enabled() else None
+                        )
+                except LLMClientError as exc:
+                    response = None
+                    response_placeholder.error(f"❌ The assistant is unavailable right now ({exc}). Please try again.")
+                else:
+                    render_response(response)
 
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                chat_history.add("user", user_input)
+                if response is not None:
+                    chat_history.add("assistant", response)
 
+end_rerun(city_registry)
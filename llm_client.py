@@ -0,0 +1,264 @@
+"""
+Pooled, non-blocking client for OpenAI-compatible chat completions.
+
+All requests run on one background asyncio loop that owns a shared aiohttp
+connection pool, so Streamlit script threads only wait on their own
+result.  Each call gets connect/read timeouts and a bounded number of
+retries with exponential backoff and jitter, for connection errors,
+timeouts, 429 and 5xx.  A semaphore caps concurrent upstream requests.
+Identical concurrent requests (same model and messages) are coalesced
+into one upstream call whose output is fanned out to every caller,
+streamed or not.
+
+Configured from the environment: OPENAI_API_BASE, OPENAI_API_KEY,
+LLM_TIMEOUT_SECONDS, LLM_CONNECT_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+LLM_MAX_CONCURRENCY.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+
+import aiohttp
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_CONCURRENCY = 8
+POOL_SIZE = 32
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+_DONE = object()
+
+
+class LLMClientError(Exception):
+    """
+    A chat completion failed after all retries.
+    """
+
+
+class RetryableStatusError(LLMClientError):
+    def __init__(self, status, body):
+        super().__init__(f"upstream returned HTTP {status}: {body[:200]}")
+        self.status = status
+
+
+def _is_retryable(exc):
+    return isinstance(exc, (RetryableStatusError, aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class _InFlight:
+    """
+    One upstream request and the callers waiting on it.
+
+    Chunks received so far are replayed to callers that join late.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.subscribers = []
+        self.error = None
+        self.done = False
+
+    def subscribe(self):
+        q = queue.Queue()
+        for chunk in self.chunks:
+            q.put(chunk)
+        if self.done:
+            q.put(self.error or _DONE)
+        else:
+            self.subscribers.append(q)
+        return q
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        for q in self.subscribers:
+            q.put(chunk)
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        for q in self.subscribers:
+            q.put(error or _DONE)
+
+
+class LLMClient:
+    """
+    Thread-safe front end; the network work happens on a private loop.
+    """
+
+    def __init__(self, api_base=DEFAULT_API_BASE, api_key=None, timeout=DEFAULT_TIMEOUT_SECONDS,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS, max_retries=DEFAULT_MAX_RETRIES,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+        self._inflight = {}
+        self._session = None
+        self._semaphore = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def settings_from_env():
+        return {
+            "api_base": os.getenv("OPENAI_API_BASE") or DEFAULT_API_BASE,
+            "api_key": os.getenv("OPENAI_API_KEY"),
+            "timeout": float(os.getenv("LLM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)),
+            "connect_timeout": float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", DEFAULT_CONNECT_TIMEOUT_SECONDS)),
+            "max_retries": int(os.getenv("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        }
+
+    def settings(self):
+        return {
+            "api_base": self.api_base,
+            "api_key": self.api_key,
+            "timeout": self.timeout,
+            "connect_timeout": self.connect_timeout,
+            "max_retries": self.max_retries,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    # -- public, called from any thread -------------------------------------------------
+
+    def complete(self, messages, model):
+        """
+        Full completion text for ``messages``.
+        """
+        return "".join(self.stream(messages, model, stream=False))
+
+    def stream(self, messages, model, stream=True):
+        """
+        Yield the completion text in chunks as the upstream sends them.
+        """
+        subscription = asyncio.run_coroutine_threadsafe(
+            self._subscribe(messages, model, stream), self._loop
+        ).result()
+        while True:
+            item = subscription.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self):
+        async def _close():
+            if self._session is not None:
+                await self._session.close()
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # -- loop side -------------------------------------------------------------------------
+
+    async def _subscribe(self, messages, model, stream):
+        payload = {"model": model, "messages": messages, "stream": stream}
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced_calls += 1
+            return inflight.subscribe()
+
+        inflight = _InFlight()
+        self._inflight[key] = inflight
+        subscription = inflight.subscribe()
+        self._loop.create_task(self._run(key, inflight, payload))
+        return subscription
+
+    async def _run(self, key, inflight, payload):
+        try:
+            if self._session is None:
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                    headers={"Authorization": f"Bearer {self.api_key or ''}"},
+                )
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with self._semaphore:
+                async for attempt in AsyncRetrying(
+                    stop=stop_after_attempt(self.max_retries + 1),
+                    wait=wait_exponential_jitter(initial=0.5, max=8.0),
+                    retry=retry_if_exception(lambda exc: _is_retryable(exc) and not inflight.chunks),
+                    reraise=True,
+                ):
+                    with attempt:
+                        await self._request(inflight, payload)
+            inflight.finish()
+        except Exception as exc:
+            inflight.finish(exc if isinstance(exc, LLMClientError) else LLMClientError(repr(exc)))
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _request(self, inflight, payload):
+        self.upstream_calls += 1
+        timeout = aiohttp.ClientTimeout(
+            total=None if payload["stream"] else self.timeout,
+            sock_connect=self.connect_timeout,
+            sock_read=self.timeout,
+        )
+        async with self._session.post(f"{self.api_base}/chat/completions", json=payload, timeout=timeout) as resp:
+            if resp.status in RETRY_STATUSES:
+                raise RetryableStatusError(resp.status, await resp.text())
+            if resp.status >= 400:
+                raise LLMClientError(f"upstream returned HTTP {resp.status}: {(await resp.text())[:200]}")
+
+            if not payload["stream"]:
+                body = await resp.json()
+                inflight.publish(body["choices"][0]["message"]["content"] or "")
+                return
+
+            async for raw in resp.content:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    inflight.publish(delta)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide client, created from the environment on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(**LLMClient.settings_from_env())
+    return _client
+
+
+def configure_from_env():
+    """
+    Make the process-wide client match the environment, replacing it only
+    if a setting changed (cheap enough to call on every rerun).
+    """
+    global _client
+    settings = LLMClient.settings_from_env()
+    with _client_lock:
+        old = _client
+        if old is not None and old.settings() == {**settings, "api_base": settings["api_base"].rstrip("/")}:
+            return old
+        _client = LLMClient(**settings)
+    if old is not None:
+        old.close()
+    return _client
@@ -0,0 +1,188 @@
+"""
+Map data for the "Explore Map" view.
+
+``MapData`` cleans a city's coordinates/prices once per data version and
+serves either square grid bins (count and mean price per cell, sized for
+the requested zoom level) or, past ``POINT_ZOOM_THRESHOLD`` or for small
+cities, individual listings capped at ``MAX_POINTS``.  Bins are memoised
+per zoom level, so only the first view at each zoom does any work.
+``build_figure`` turns either view into the Plotly map.  ``state`` captures
+everything the app's zoom range needs (see startup_bundle.py), so a
+restored MapData serves the map without the listings.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Zoom range offered by the map view.
+MIN_ZOOM = 9
+MAX_ZOOM = 16
+# Zoom level from which individual listings are shown instead of bins.
+POINT_ZOOM_THRESHOLD = 14
+# Cities with at most this many priced listings are always shown as points.
+POINT_CAP = 5_000
+# Upper bound on the points sent to the browser (sampled beyond that).
+MAX_POINTS = 20_000
+# Approximate on-screen size of one bin, in web-mercator pixels.
+BIN_PIXELS = 24
+
+
+def cell_size_degrees(zoom, bin_pixels=BIN_PIXELS):
+    """
+    Longitude span of a ``bin_pixels`` wide cell at ``zoom``.
+    """
+    return bin_pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def _frame_bytes(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+class MapData:
+    """
+    Cleaned listing coordinates for one city plus cached per-zoom bins.
+    """
+
+    def __init__(self, df):
+        clean = df[["latitude", "longitude", "price", "neighbourhood"]].dropna(
+            subset=["price", "latitude", "longitude"]
+        )
+        self.lat = clean["latitude"].to_numpy(dtype=np.float64)
+        self.lon = clean["longitude"].to_numpy(dtype=np.float64)
+        self.price = clean["price"].to_numpy(dtype=np.float64)
+        self.neighbourhood = clean["neighbourhood"].to_numpy()
+        self.center = {"lat": float(np.median(self.lat)), "lon": float(np.median(self.lon))} if len(clean) else None
+        self._bins = {}
+        self._points = None
+        self._lock = threading.Lock()
+        # Approximate memory held; each bin frame and the point sample add
+        # their own size when they are built.
+        self.nbytes = sum(array.nbytes for array in (self.lat, self.lon, self.price, self.neighbourhood))
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        MapData restored from ``state()``; it has no listing coordinates,
+        so only the zoom levels in the state can be served.
+        """
+        self = cls.__new__(cls)
+        self.lat = self.lon = self.price = self.neighbourhood = None
+        self.center = state["center"]
+        self._count = state["count"]
+        self._bins = dict(state["bins"])
+        self._points = state["points"]
+        self._lock = threading.Lock()
+        self.nbytes = sum(_frame_bytes(frame) for frame in [*self._bins.values(), self._points] if frame is not None)
+        return self
+
+    def state(self, zooms=range(MIN_ZOOM, MAX_ZOOM + 1)):
+        """
+        Centre, point sample and the bins of every binned zoom in ``zooms``.
+        """
+        return {
+            "center": self.center,
+            "count": len(self),
+            "bins": {zoom: self.bins(zoom) for zoom in zooms if not self.uses_points(zoom)},
+            "points": self.points() if any(self.uses_points(zoom) for zoom in zooms) else None,
+        }
+
+    def __len__(self):
+        return len(self.price) if self.price is not None else self._count
+
+    def uses_points(self, zoom):
+        return zoom >= POINT_ZOOM_THRESHOLD or len(self) <= POINT_CAP
+
+    def points(self):
+        """
+        Individual listings, randomly sampled down to ``MAX_POINTS``.
+        """
+        if self._points is None:
+            idx = np.arange(len(self))
+            if len(idx) > MAX_POINTS:
+                idx = np.sort(np.random.default_rng(0).choice(idx, MAX_POINTS, replace=False))
+            points = pd.DataFrame({
+                "latitude": self.lat[idx],
+                "longitude": self.lon[idx],
+                "price": self.price[idx],
+                "neighbourhood": self.neighbourhood[idx],
+            })
+            with self._lock:
+                if self._points is None:
+                    self._points = points
+                    self.nbytes += _frame_bytes(points)
+        return self._points
+
+    def bins(self, zoom):
+        """
+        Grid bins for ``zoom``: centroid, listing count and mean price.
+        """
+        zoom = int(zoom)
+        cached = self._bins.get(zoom)
+        if cached is not None:
+            return cached
+
+        lon_step = cell_size_degrees(zoom)
+        # Keep cells roughly square on screen at the city's latitude.
+        lat_step = lon_step * np.cos(np.radians(self.center["lat"])) if self.center else lon_step
+        ix = np.floor(self.lon / lon_step).astype(np.int64)
+        iy = np.floor(self.lat / lat_step).astype(np.int64)
+        keys = (ix - ix.min()) * (iy.max() - iy.min() + 1) + (iy - iy.min()) if len(ix) else ix
+        _, cell, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+        bins = pd.DataFrame({
+            "latitude": np.bincount(cell, weights=self.lat) / counts,
+            "longitude": np.bincount(cell, weights=self.lon) / counts,
+            "listings": counts,
+            "mean_price": np.bincount(cell, weights=self.price) / counts,
+        })
+        with self._lock:
+            if zoom not in self._bins:
+                self._bins[zoom] = bins
+                self.nbytes += _frame_bytes(bins)
+        return self._bins[zoom]
+
+    def view(self, zoom):
+        """
+        ``("points", frame)`` or ``("bins", frame)`` for the given zoom.
+        """
+        if self.uses_points(zoom):
+            return "points", self.points()
+        return "bins", self.bins(zoom)
+
+
+def build_figure(map_data, zoom, city):
+    """
+    Plotly mapbox figure of ``map_data`` at ``zoom``.
+    """
+    import plotly.express as px
+
+    mode, frame = map_data.view(zoom)
+    common = dict(
+        lat="latitude",
+        lon="longitude",
+        color_continuous_scale=px.colors.cyclical.IceFire,
+        size_max=15,
+        zoom=zoom,
+        center=map_data.center,
+        mapbox_style="carto-positron",
+    )
+    if mode == "points":
+        return px.scatter_mapbox(
+            frame,
+            color="price",
+            size="price",
+            hover_name="neighbourhood",
+            hover_data={"price": True, "latitude": False, "longitude": False},
+            title=f"Interactive Map of {city} Listings Colored by Average Price and Sized by Average Price",
+            **common,
+        )
+    return px.scatter_mapbox(
+        frame,
+        color="mean_price",
+        size="listings",
+        hover_data={"mean_price": ":.2f", "listings": True, "latitude": False, "longitude": False},
+        labels={"mean_price": "Average Price", "listings": "Listings"},
+        title=f"Interactive Map of {city} Listings Colored by Average Price and Sized by Number of Listings",
+        **common,
+    )
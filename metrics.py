@@ -0,0 +1,354 @@
+"""
+Timing spans, LLM usage and memory metrics for the app.
+
+Every script run is a ``RerunTrace``: ``start_rerun`` opens one for the
+current thread (Streamlit runs each session's script on its own thread),
+``span(name)`` times a stage of it, and ``finish_rerun`` closes it.  Span
+durations feed the process-wide ``app_stage_seconds`` histogram, LLM calls
+(``record_llm_call``) feed token counters and latency histograms, and
+registered collectors (e.g. the city registry's memory per city) refresh
+gauges at export time.
+
+Exports, configured from the environment by ``configure_from_env``:
+
+- one JSON log line per rerun and per LLM call on the ``metrics`` logger
+  (also appended to ``METRICS_LOG_PATH`` if set);
+- Prometheus text format, rewritten to ``METRICS_PROMETHEUS_FILE`` after
+  every rerun and/or served on ``http://0.0.0.0:METRICS_PORT/metrics``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("metrics")
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.type = "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self.type = "gauge"
+
+    def replace(self, values):
+        """
+        Set the whole family at once; ``values`` maps label dicts (as
+        tuples of pairs) to numbers, dropping series not in it.
+        """
+        with self._lock:
+            self._values = {_label_key(dict(labels)): value for labels, value in values.items()}
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.type = "histogram"
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), [0.0, 0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            total[0] += value
+            total[1] += 1
+            self._series[key] = (counts, total)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, (total, count)) in self._series.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    out.append((f"{self.name}_bucket", key + (("le", f"{bound:g}"),), bucket_count))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, count))
+        return out
+
+
+STAGE_SECONDS = Histogram("app_stage_seconds", "Duration of a named stage of a script run.", STAGE_BUCKETS)
+RERUN_SECONDS = Histogram("app_rerun_seconds", "Duration of a whole script run.", STAGE_BUCKETS)
+RERUNS = Counter("app_reruns_total", "Script runs, by how they ended.")
+LLM_CALLS = Counter("llm_calls_total", "Chat completions, by model and whether the cache answered.")
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens sent to the model.")
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens received from the model.")
+LLM_LATENCY = Histogram("llm_latency_seconds", "Total latency of a chat completion.", LLM_BUCKETS)
+LLM_TTFT = Histogram("llm_time_to_first_token_seconds", "Time to the first streamed token.", LLM_BUCKETS)
+DATASET_BYTES = Gauge("dataset_memory_bytes", "Memory held by a loaded city dataset.")
+DATASET_ROWS = Gauge("dataset_rows", "Listings in a loaded city dataset.")
+DATA_REFRESHES = Counter("data_refreshes_total", "Listings snapshots applied, by city and outcome.")
+
+METRICS = [
+    STAGE_SECONDS, RERUN_SECONDS, RERUNS,
+    LLM_CALLS, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS, LLM_LATENCY, LLM_TTFT,
+    DATASET_BYTES, DATASET_ROWS, DATA_REFRESHES,
+]
+
+_collectors = {}
+_local = threading.local()
+
+
+def register_collector(name, fn):
+    """
+    Call ``fn()`` before every export so it can refresh gauges; a second
+    registration under the same name replaces the first.
+    """
+    _collectors[name] = fn
+
+
+def collect():
+    for fn in list(_collectors.values()):
+        try:
+            fn()
+        except Exception:  # a broken collector must not break the app
+            logger.exception("metrics collector failed")
+
+
+def render_prometheus():
+    """
+    Every metric in the Prometheus text exposition format.
+    """
+    collect()
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class RerunTrace:
+    """
+    Named timing spans of one script run.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+        self.llm_calls = []
+        self.total = None
+        self._depth = 0
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            seconds = time.perf_counter() - start
+            self.spans.append({
+                "stage": name,
+                "start_ms": (start - self.started) * 1e3,
+                "ms": seconds * 1e3,
+                "depth": self._depth,
+            })
+            STAGE_SECONDS.observe(seconds, stage=name)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "event": "rerun",
+            "session": self.session_id,
+            "ts": self.wall_started,
+            "total_ms": (self.total if self.total is not None else self.elapsed()) * 1e3,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "llm_calls": self.llm_calls,
+        }
+
+
+def start_rerun(session_id=None):
+    """
+    Open the trace for this thread's script run.  A trace left open by the
+    previous run (st.rerun/st.stop) is closed as "interrupted" first.
+    """
+    previous = getattr(_local, "trace", None)
+    if previous is not None:
+        finish_rerun(status="interrupted")
+    _local.trace = RerunTrace(session_id)
+    return _local.trace
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name):
+    """
+    Time a stage of the current script run (recorded in the stage
+    histogram even outside a run).
+    """
+    trace = current_trace()
+    if trace is None:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+        return
+    with trace.span(name):
+        yield
+
+
+def finish_rerun(status="completed"):
+    """
+    Close this thread's trace, log it and refresh the metrics file.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return None
+    _local.trace = None
+    trace.total = trace.elapsed()
+    RERUN_SECONDS.observe(trace.total)
+    RERUNS.inc(status=status)
+    logger.info(json.dumps({**trace.as_dict(), "status": status}, default=str))
+    write_prometheus_file()
+    return trace
+
+
+def record_llm_call(timing):
+    """
+    Count one chat completion (a chat.ChatTiming) and attach it to the
+    current trace.
+    """
+    labels = {"model": timing.model, "cached": str(bool(timing.cached)).lower()}
+    LLM_CALLS.inc(**labels)
+    if not timing.cached:
+        LLM_PROMPT_TOKENS.inc(timing.prompt_tokens, model=timing.model)
+        LLM_COMPLETION_TOKENS.inc(timing.completion_tokens, model=timing.model)
+    if timing.total is not None:
+        LLM_LATENCY.observe(timing.total, **labels)
+    if timing.streamed and timing.first_token is not None and not timing.cached:
+        LLM_TTFT.observe(timing.first_token, model=timing.model)
+    call = timing.as_dict()
+    logger.info(json.dumps({"event": "llm_call", **call}, default=str))
+    trace = current_trace()
+    if trace is not None:
+        trace.llm_calls.append(call)
+
+
+def write_prometheus_file(path=None):
+    path = path or os.getenv("METRICS_PROMETHEUS_FILE")
+    if not path:
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.exception("could not write %s", path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_log_handler = None
+_configure_lock = threading.Lock()
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """
+    Serve ``/metrics`` on a daemon thread; returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure_from_env():
+    """
+    Set up the JSON log file and the /metrics endpoint once per process.
+    """
+    global _server, _log_handler
+    log_path = os.getenv("METRICS_LOG_PATH")
+    port = os.getenv("METRICS_PORT")
+    if (not log_path or _log_handler is not None) and (not port or _server is not None):
+        return
+    with _configure_lock:
+        if log_path and _log_handler is None:
+            _log_handler = logging.FileHandler(log_path, encoding="utf-8")
+            _log_handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(_log_handler)
+            logger.setLevel(logging.INFO)
+        if port and _server is None:
+            try:
+                _server = start_http_server(int(port))
+            except OSError:
+                # Another process (e.g. a second app worker) owns the port.
+                logger.exception("metrics endpoint not started on port %s", port)
+                _server = False
+
+
+def debug_enabled():
+    """
+    The debug sidebar panel is shown when METRICS_DEBUG is 1/true/yes.
+    """
+    return os.getenv("METRICS_DEBUG", "0").strip().lower() in ("1", "true", "yes")
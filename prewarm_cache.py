@@ -0,0 +1,39 @@
+"""
+Pre-warm the LLM response cache with every example question.
+
+Run at deploy time, after the city data is in place:
+    python prewarm_cache.py            # every city with example questions
+    python prewarm_cache.py London
+
+Questions already cached are not sent to the model again.
+"""
+import sys
+
+from dotenv import load_dotenv
+
+import chat
+import llm_cache
+from city_registry import get_registry
+from example_questions import EXAMPLE_QUESTIONS, questions_for_city
+
+
+def prewarm_city(registry, cache, city):
+    dataset = registry.get(city)
+    if dataset is None:
+        print(f"{city}: not in cities.toml, skipped")
+        return
+    for question in questions_for_city(city):
+        csv_summary = dataset.context_index.select(question)
+        _, timing = chat.answer_question(question, city, csv_summary, "", cache=cache)
+        source = "cached" if timing.cached else f"fetched in {timing.total:.1f}s"
+        print(f"{city}: {question} [{source}]")
+
+
+if __name__ == "__main__":
+    load_dotenv("OPEN_API_KEY.env")
+    chat.configure_client()
+    registry = get_registry()
+    cache = llm_cache.get_cache()
+    for city in sys.argv[1:] or [c for c in registry.city_names() if c in EXAMPLE_QUESTIONS]:
+        prewarm_city(registry, cache, city)
+    print(cache.stats())
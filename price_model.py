@@ -0,0 +1,257 @@
+"""
+Nightly price model: offline training and a warm-loaded predictor.
+
+``train_price_model`` fits a gradient-boosted regressor on a city's
+listings (location, room type and whatever capacity/review/availability
+columns the file has) and ``save_artifact`` writes it as a versioned
+pickle under ``models/<city>/``.  ``get_predictor`` loads the newest
+artifact once per process; ``PricePredictor.predict`` scores one property
+or a whole batch in a single vectorized call.
+"""
+import glob
+import os
+import pickle
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import datasets
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+# Bump when the artifact's contents change; older artifacts must be retrained.
+ARTIFACT_FORMAT = 2
+
+CATEGORICAL_FEATURES = ["neighbourhood", "room_type"]
+NUMERIC_FEATURES = ["latitude", "longitude", *datasets.OPTIONAL_COLUMNS]
+
+# HistGradientBoosting treats at most this many levels as categorical.
+MAX_CATEGORIES = 255
+
+# Published latency targets, checked by benchmarks/bench_predict.py.
+LATENCY_TARGETS_MS = {
+    "single": {"p50": 5.0, "p99": 20.0},
+    "batch_10000": {"p50": 100.0, "p99": 250.0},
+}
+
+
+def _city_key(city):
+    return re.sub(r"[^a-z0-9]+", "_", city.lower()).strip("_")
+
+
+def feature_columns(df):
+    """
+    Model features available in ``df``, categoricals first.
+    """
+    return CATEGORICAL_FEATURES + [col for col in NUMERIC_FEATURES if col in df.columns]
+
+
+class PricePredictor:
+    """
+    A trained model plus everything needed to turn raw rows into features.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.model = artifact["model"]
+        self.features = artifact["features"]
+        self.categories = artifact["categories"]
+        self.defaults = artifact["defaults"]
+        self.centroids = artifact["centroids"]
+        self.version = artifact["version"]
+        self.smearing = artifact["smearing"]
+        self._category_index = {col: pd.Index(values) for col, values in self.categories.items()}
+        # Neighbourhood centroids aligned with the neighbourhood codes, with
+        # a trailing NaN slot for unknown (-1) codes.
+        neighbourhoods = self.categories["neighbourhood"]
+        self._centroid_by_code = {
+            col: np.array([self.centroids[col].get(nb, np.nan) for nb in neighbourhoods] + [np.nan])
+            for col in ("latitude", "longitude")
+        }
+
+    def _matrix(self, frame):
+        """
+        Build the float feature matrix, filling gaps from the training data.
+        """
+        n = len(frame)
+        X = np.empty((n, len(self.features)), dtype=np.float64)
+        codes = {}
+        for col, index in self._category_index.items():
+            values = np.asarray(frame[col], dtype=object) if col in frame else np.full(n, None, dtype=object)
+            codes[col] = index.get_indexer(values)
+
+        for j, col in enumerate(self.features):
+            if col in codes:
+                X[:, j] = np.where(codes[col] < 0, np.nan, codes[col])
+                continue
+            if col in frame:
+                values = frame[col]
+                if not pd.api.types.is_numeric_dtype(values):
+                    values = pd.to_numeric(values, errors="coerce")
+                values = np.asarray(values, dtype=np.float64)
+            else:
+                values = np.full(n, np.nan)
+            if col in self._centroid_by_code:
+                values = np.where(np.isnan(values), self._centroid_by_code[col][codes["neighbourhood"]], values)
+            X[:, j] = np.where(np.isnan(values), self.defaults[col], values)
+        return X
+
+    def predict(self, frame):
+        """
+        Predicted nightly price for every row of ``frame`` (a DataFrame or a
+        dict of columns). Missing features are imputed.
+        """
+        if not isinstance(frame, pd.DataFrame):
+            frame = pd.DataFrame(frame)
+        if frame.empty:
+            return np.empty(0)
+        return to_price(self.model.predict(self._matrix(frame)), self.smearing)
+
+    def predict_one(self, **features):
+        """
+        Predicted nightly price for a single property.
+        """
+        return float(self.predict(pd.DataFrame([features]))[0])
+
+
+def to_price(log_price, smearing):
+    """
+    Mean nightly price from a prediction of ``log1p(price)``.
+
+    ``expm1`` alone gives roughly the median, which sits below the mean for
+    right-skewed prices; Duan's ``smearing`` factor (the mean of the
+    exponentiated residuals) restores the mean the ROI simulation expects.
+    """
+    return np.maximum(np.exp(log_price) * smearing - 1, 0.0)
+
+
+def train_price_model(df, city, data_version="", random_state=0):
+    """
+    Fit the price model on a city's listings and return the artifact dict.
+    """
+    # scikit-learn is only needed to train; loading an artifact imports
+    # just the estimator's own module.
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    df = df[df["price"].notna() & (df["price"] > 0)]
+    df = df[df["price"] <= df["price"].quantile(0.995)]
+    features = feature_columns(df)
+
+    categories = {col: sorted(df[col].dropna().unique()) for col in CATEGORICAL_FEATURES}
+    numeric = [col for col in features if col not in categories]
+    defaults = {col: float(df[col].median()) for col in numeric}
+    centroids = {
+        col: df.groupby("neighbourhood", observed=True)[col].mean().astype(float).to_dict()
+        for col in ("latitude", "longitude")
+    }
+
+    categorical_mask = [col in categories and len(categories[col]) <= MAX_CATEGORIES for col in features]
+    predictor = PricePredictor({
+        "model": None, "smearing": 1.0, "features": features, "categories": categories,
+        "defaults": defaults, "centroids": centroids, "version": None,
+    })
+    X = predictor._matrix(df)
+    y = np.log1p(df["price"].to_numpy(dtype=np.float64))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state)
+
+    model = HistGradientBoostingRegressor(
+        max_iter=300,
+        learning_rate=0.08,
+        categorical_features=np.array(categorical_mask),
+        early_stopping=True,
+        random_state=random_state,
+    )
+    model.fit(X_train, y_train)
+
+    log_predicted = model.predict(X_test)
+    smearing = float(np.mean(np.exp(y_test - log_predicted)))
+    predicted = to_price(log_predicted, smearing)
+    actual = np.expm1(y_test)
+    return {
+        "format": ARTIFACT_FORMAT,
+        "city": city,
+        "data_version": data_version,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "features": features,
+        "categories": categories,
+        "defaults": defaults,
+        "centroids": centroids,
+        "smearing": smearing,
+        "metrics": {
+            "mae": float(mean_absolute_error(actual, predicted)),
+            "r2_log": float(r2_score(y_test, log_predicted)),
+            "n_train": int(len(X_train)),
+            "n_test": int(len(X_test)),
+        },
+        "model": model,
+    }
+
+
+def artifact_paths(city, models_dir=MODELS_DIR):
+    """
+    Existing artifacts for ``city`` as (version, path), oldest first.
+    """
+    found = []
+    for path in glob.glob(os.path.join(models_dir, _city_key(city), "price_model-v*.pkl")):
+        match = re.search(r"price_model-v(\d+)\.pkl$", path)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def save_artifact(artifact, models_dir=MODELS_DIR):
+    """
+    Write ``artifact`` as the next version for its city; returns the path.
+    """
+    existing = artifact_paths(artifact["city"], models_dir)
+    version = existing[-1][0] + 1 if existing else 1
+    artifact = {**artifact, "version": version}
+
+    city_dir = os.path.join(models_dir, _city_key(artifact["city"]))
+    os.makedirs(city_dir, exist_ok=True)
+    path = os.path.join(city_dir, f"price_model-v{version}.pkl")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        pickle.dump(artifact, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(path):
+    with open(path, "rb") as fh:
+        artifact = pickle.load(fh)
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(
+            f"{path}: unsupported model artifact format {artifact.get('format')!r}; retrain with train_model.py"
+        )
+    return artifact
+
+
+_predictors = {}
+_lock = threading.Lock()
+
+
+def get_predictor(city, models_dir=MODELS_DIR):
+    """
+    Newest trained predictor for ``city``, loaded once per process.
+
+    Returns None when no model has been trained for the city yet.
+    """
+    existing = artifact_paths(city, models_dir)
+    if not existing:
+        return None
+    path = existing[-1][1]
+
+    cached = _predictors.get(city)
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    with _lock:
+        cached = _predictors.get(city)
+        if cached is None or cached[0] != path:
+            cached = (path, PricePredictor(load_artifact(path)))
+            _predictors[city] = cached
+        return cached[1]
@@ -0,0 +1,147 @@
+"""
+Nightly price and investment insights for candidate properties.
+
+``score_properties`` is the one code path behind both the app's "Get
+Insights" button and the ``score_portfolio.py`` batch scorer.  It takes a
+DataFrame of candidates (neighbourhood, room type, purchase price and any
+financing or listing columns they have) and, in a few vectorized steps,
+looks up the market stats, predicts the nightly price with the city's
+trained model (or falls back to the market average) and runs the Monte
+Carlo ROI simulation for every row.  ``estimate_property`` wraps it for a
+single property and memoises the result.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import roi_simulator
+
+REQUIRED_COLUMNS = ["neighbourhood", "room_type", "purchase_price"]
+
+# The app simulates one property at a time and can afford more scenarios.
+APP_SCENARIOS = 5000
+BATCH_SCENARIOS = 1000
+
+SCORE_COLUMNS = [
+    "price_level",
+    "average_price",
+    "predicted_price",
+    "revenue_p10",
+    "revenue_p50",
+    "revenue_p90",
+    "roi_p10",
+    "roi_p50",
+    "roi_p90",
+    "break_even_p10",
+    "break_even_p50",
+    "break_even_p90",
+    "break_even_probability",
+]
+
+
+def property_arrays(candidates):
+    """
+    PropertyInputs fields as arrays, with defaults for missing columns/values.
+
+    ``purchase_price`` has no default: a missing, non-numeric or
+    non-positive price raises ValueError rather than being scored.
+    """
+    purchase_price = pd.to_numeric(candidates["purchase_price"], errors="coerce").to_numpy(dtype=np.float64)
+    invalid = ~(purchase_price > 0)
+    if invalid.any():
+        raise ValueError(
+            f"{int(invalid.sum())} rows have a missing, non-numeric or non-positive purchase_price "
+            f"(first: {candidates['purchase_price'].iloc[int(np.argmax(invalid))]!r})"
+        )
+    arrays = {"purchase_price": purchase_price}
+    for name, default in roi_simulator.PROPERTY_DEFAULTS.items():
+        if name in candidates:
+            values = pd.to_numeric(candidates[name], errors="coerce").to_numpy(dtype=np.float64)
+            arrays[name] = np.where(np.isnan(values), default, values)
+        else:
+            arrays[name] = np.full(len(candidates), default, dtype=np.float64)
+    return arrays
+
+
+def score_properties(candidates, city_aggregates, predictor=None, n_scenarios=BATCH_SCENARIOS, seed=0):
+    """
+    Score every candidate property; returns a DataFrame of ``SCORE_COLUMNS``
+    aligned with ``candidates``.
+
+    ``predictor`` is the city's PricePredictor, or None to price each
+    property at its market average.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in candidates]
+    if missing:
+        raise ValueError(f"candidates are missing required columns: {', '.join(missing)}")
+
+    stats = city_aggregates.lookup_many(candidates["neighbourhood"], candidates["room_type"])
+    average_price = stats["mean"].to_numpy(dtype=np.float64)
+    if predictor is not None and len(candidates):
+        predicted_price = predictor.predict(candidates)
+    else:
+        predicted_price = average_price
+
+    market = roi_simulator.market_arrays(
+        predicted_price,
+        average_price,
+        stats["std"].to_numpy(dtype=np.float64),
+        stats["occupancy_mean"].to_numpy(dtype=np.float64),
+        stats["occupancy_std"].to_numpy(dtype=np.float64),
+    )
+    simulation = roi_simulator.simulate_many(property_arrays(candidates), market, n_scenarios=n_scenarios, seed=seed)
+
+    scores = pd.DataFrame(
+        {"price_level": stats["level"].to_numpy(), "average_price": average_price, "predicted_price": predicted_price, **simulation},
+        index=candidates.index,
+    )
+    return scores[SCORE_COLUMNS]
+
+
+class PropertyInsight:
+    """
+    Scores for one property, in the shape the app displays.
+    """
+
+    def __init__(self, neighbourhood, room_type, prop, scores, n_scenarios):
+        self.neighbourhood = neighbourhood
+        self.room_type = room_type
+        self.prop = prop
+        row = scores.iloc[0]
+        self.price_level = row["price_level"]
+        self.average_price = float(row["average_price"])
+        self.predicted_price = float(row["predicted_price"])
+        self.simulation = roi_simulator.SimulationResult(
+            scores.reset_index(drop=True), 0, n_scenarios, prop.horizon_months
+        )
+
+    def csv_info(self):
+        """
+        Property context for the chatbot prompt.
+        """
+        prop = self.prop
+        return (
+            f"For neighborhood '{self.neighbourhood}' and property type '{self.room_type}', "
+            f"the average nightly price is £{self.average_price:.2f} and the estimated nightly price is "
+            f"£{self.predicted_price:.2f}. Estimated monthly revenue is £{self.simulation.monthly_revenue[50]:.2f}. "
+            f"Purchase price £{prop.purchase_price:,.0f}, {prop.deposit_pct:g}% deposit, {prop.mortgage_rate_pct:.2f}% mortgage, "
+            f"£{prop.monthly_costs:,.0f} monthly running costs. {self.simulation.summary()}"
+        )
+
+
+@lru_cache(maxsize=256)
+def estimate_property(city_aggregates, predictor, neighbourhood, room_type, prop, n_scenarios=APP_SCENARIOS):
+    """
+    Insights for a single property (``prop`` is a PropertyInputs).
+
+    Keyed on the aggregates/predictor objects themselves, so a refreshed
+    dataset or a newly trained model never reuses stale results.
+    """
+    candidate = pd.DataFrame([{
+        "neighbourhood": neighbourhood,
+        "room_type": room_type,
+        **{name: getattr(prop, name) for name in roi_simulator.PROPERTY_FIELDS},
+    }])
+    scores = score_properties(candidate, city_aggregates, predictor, n_scenarios=n_scenarios)
+    return PropertyInsight(neighbourhood, room_type, prop, scores, n_scenarios)
@@ -0,0 +1,210 @@
+"""
+Question-aware selection of the city data sent to the chatbot.
+
+Instead of pasting one line per neighbourhood/room_type pair into every
+system message, ``ContextIndex`` indexes the aggregate rows and picks the
+ones relevant to a question.  City and room-type rollups are always
+included.  A question naming neighbourhoods (exactly, or fuzzily when none
+is named exactly) gets their totals and pair rows; any other question gets
+one compact totals line per neighbourhood, so comparisons across the city
+can be answered, ranked by the measure the question asks about (price,
+occupancy, else listings), then the pair rows of the top-ranked ones.
+Rows are added in that order until the token budget is used up.
+"""
+import difflib
+import logging
+import os
+import re
+import sys
+import unicodedata
+
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_TOP_NEIGHBOURHOODS = 8
+# Similarity needed for a fuzzy match: catches typos and missing accents,
+# not different names that happen to look alike.
+FUZZY_CUTOFF = 0.9
+
+# Words in a question that point at a room type.
+ROOM_TYPE_HINTS = {
+    "Entire home/apt": ["entire", "apartment", "apartments", "flat", "flats", "studio", "house", "home",
+                        "bedroom", "one-bedroom", "two-bedroom", "three-bedroom"],
+    "Private room": ["private room", "private rooms", "spare room"],
+    "Shared room": ["shared room", "shared rooms", "shared"],
+    "Hotel room": ["hotel", "hotels"],
+}
+
+# Words in a question that say how to rank neighbourhoods, as (cube
+# column, ascending); the first that matches wins, else listings count.
+RANKING_HINTS = [
+    (["cheap", "cheapest", "cheaper", "affordable", "affordability", "low cost", "lowest price"], ("mean", True)),
+    (["expensive", "priciest", "pricey", "luxury", "highest price", "most valuable"], ("mean", False)),
+    (["occupancy", "occupied", "demand", "busiest", "booked", "popular"], ("occupancy_mean", False)),
+]
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to the estimate below.
+    _encoding = None
+
+
+def count_tokens(text):
+    """
+    Token count of ``text``: exact with tiktoken installed, otherwise a
+    word/punctuation based estimate (within ~10% for English prose).
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    pieces = re.findall(r"\w+|[^\w\s]", text)
+    return int(sum(1 + len(p) // 6 for p in pieces))
+
+
+def token_budget():
+    return int(os.getenv("PROMPT_CONTEXT_TOKENS", DEFAULT_TOKEN_BUDGET))
+
+
+def _fold(text):
+    """
+    Lower-case, accent-free, single-spaced form used for matching.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _ngrams(words, max_n=3):
+    for n in range(1, max_n + 1):
+        for i in range(len(words) - n + 1):
+            yield " ".join(words[i:i + n])
+
+
+def _line(row):
+    return (
+        f"- {row['neighbourhood']} / {row['room_type']}: Average Price = £{row['mean']:.2f}, "
+        f"Median = £{row['median']:.2f}, Listings = {row['count']}"
+    )
+
+
+def _neighbourhood_line(row):
+    occupancy = row["occupancy_mean"]
+    occupancy = f", Occupancy = {occupancy:.0%}" if occupancy == occupancy else ""
+    return (
+        f"- {row['neighbourhood']} (all types): Average Price = £{row['mean']:.0f}, "
+        f"Median = £{row['median']:.0f}{occupancy}, Listings = {row['count']}"
+    )
+
+
+class ContextIndex:
+    """
+    Aggregate rows of one city, indexed for question-driven selection.
+    """
+
+    def __init__(self, city_aggregates, city_name):
+        # Imported here so count_tokens (used by chat and conversation)
+        # doesn't pull in pandas.
+        import aggregates
+
+        self.city_name = city_name
+        cube = city_aggregates.cube
+        pair = cube[cube["level"] == aggregates.LEVEL_PAIR]
+        self._pair_lines = {(row["neighbourhood"], row["room_type"]): _line(row) for row in pair.to_dict("records")}
+        by_nb = cube[cube["level"] == aggregates.LEVEL_NEIGHBOURHOOD].sort_values("count", ascending=False)
+        self._ranked_neighbourhoods = list(by_nb["neighbourhood"])
+        self._neighbourhood_lines = {row["neighbourhood"]: _neighbourhood_line(row) for row in by_nb.to_dict("records")}
+        self._rankings = {
+            ranking: list(by_nb.sort_values(ranking[0], ascending=ranking[1], kind="stable")["neighbourhood"])
+            for _, ranking in RANKING_HINTS
+        }
+        self._room_types = list(city_aggregates.room_types)
+        self._folded_neighbourhoods = {_fold(nb): nb for nb in self._ranked_neighbourhoods}
+
+        city = city_aggregates.city()
+        rollups = [f"- {city_name} overall: Average Price = £{city['mean']:.2f}, "
+                   f"Median = £{city['median']:.2f}, Listings = {city['count']}"]
+        for row in cube[cube["level"] == aggregates.LEVEL_ROOM_TYPE].to_dict("records"):
+            rollups.append(f"- All {row['room_type']}: Average Price = £{row['mean']:.2f}, Listings = {row['count']}")
+        self._rollup_lines = rollups
+        self.full_tokens = count_tokens(city_aggregates.summary_text(city_name))
+        # Approximate memory held by the prepared lines and name lookups.
+        strings = [
+            *self._pair_lines.values(), *self._neighbourhood_lines.values(),
+            *self._rollup_lines, *self._folded_neighbourhoods,
+        ]
+        self.nbytes = sum(sys.getsizeof(text) for text in strings) + sys.getsizeof(self._pair_lines)
+
+    def match_neighbourhoods(self, question):
+        """
+        Neighbourhoods named in ``question``.  Fuzzy matching (for typos and
+        missing accents) is only tried when no name matches exactly.
+        """
+        folded = f" {_fold(question)} "
+        exact = [nb for key, nb in self._folded_neighbourhoods.items() if key and f" {key} " in folded]
+        if exact:
+            return exact
+        fuzzy = []
+        for gram in _ngrams(folded.split()):
+            if len(gram) < 4:
+                continue
+            for key in difflib.get_close_matches(gram, self._folded_neighbourhoods, n=2, cutoff=FUZZY_CUTOFF):
+                nb = self._folded_neighbourhoods[key]
+                # Numbers tell districts apart, so they must match exactly.
+                if re.findall(r"\d+", key) == re.findall(r"\d+", gram) and nb not in fuzzy:
+                    fuzzy.append(nb)
+        return fuzzy
+
+    def match_room_types(self, question):
+        folded = f" {_fold(question)} "
+        matched = []
+        for room_type in self._room_types:
+            hints = [_fold(room_type)] + [_fold(h) for h in ROOM_TYPE_HINTS.get(room_type, [])]
+            if any(f" {hint} " in folded for hint in hints):
+                matched.append(room_type)
+        return matched
+
+    def rank_neighbourhoods(self, question):
+        """
+        All neighbourhoods, ordered by the measure ``question`` asks about
+        (see RANKING_HINTS), else by listings count.
+        """
+        folded = f" {_fold(question)} "
+        for hints, ranking in RANKING_HINTS:
+            if any(f" {_fold(hint)} " in folded for hint in hints):
+                return self._rankings[ranking]
+        return self._ranked_neighbourhoods
+
+    def select(self, question, budget=None, top_n=DEFAULT_TOP_NEIGHBOURHOODS):
+        """
+        Context text for ``question`` that fits in ``budget`` tokens.
+        """
+        budget = token_budget() if budget is None else budget
+        named = self.match_neighbourhoods(question)
+        room_types = self.match_room_types(question) or self._room_types
+        ranked = named or self.rank_neighbourhoods(question)
+        neighbourhoods = named or ranked[:top_n]
+
+        scope = "the neighbourhoods named in the question" if named else "every neighbourhood"
+        header = (
+            f"Summary of {self.city_name} data (totals for {scope}, then neighbourhood / room_type rows "
+            f"relevant to the question; {len(self._ranked_neighbourhoods)} neighbourhoods in total):"
+        )
+        lines = [header, *self._rollup_lines]
+        used = count_tokens("\n".join(lines))
+        candidates = [
+            *(self._neighbourhood_lines.get(nb) for nb in ranked),
+            *(self._pair_lines.get((nb, rt)) for nb in neighbourhoods for rt in room_types),
+        ]
+        for line in filter(None, candidates):
+            cost = count_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+
+        logger.info(
+            "prompt context city=%s full_tokens=%d selected_tokens=%d rows=%d",
+            self.city_name, self.full_tokens, used, len(lines) - 1 - len(self._rollup_lines),
+        )
+        return "\n".join(lines)
@@ -0,0 +1,162 @@
+"""
+Monte Carlo ROI and break-even simulation for rental properties.
+
+``simulate_many`` runs thousands of scenarios for many properties at once,
+as (properties x scenarios) NumPy arrays.  Each scenario gets a nightly
+price level (lognormal) and an occupancy level (beta), and the resulting
+monthly cash flow after platform fees, mortgage and running costs gives
+an annual cash-on-cash ROI and a break-even month.  ``pricing`` feeds it
+one property (the app) or a chunk of thousands (the batch scorer).
+"""
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+DAYS_PER_MONTH = 365.0 / 12
+DEFAULT_OCCUPANCY_MEAN = 0.6
+DEFAULT_OCCUPANCY_STD = 0.15
+DEFAULT_PRICE_CV = 0.3
+PERCENTILES = (10, 50, 90)
+
+
+@dataclass(frozen=True)
+class PropertyInputs:
+    """
+    What the investor pays and how the purchase is financed.
+    """
+
+    purchase_price: float
+    deposit_pct: float = 25.0
+    mortgage_rate_pct: float = 5.0
+    mortgage_years: int = 25
+    upfront_costs: float = 15_000.0
+    monthly_costs: float = 600.0
+    platform_fee_pct: float = 15.0
+    horizon_months: int = 240
+
+
+PROPERTY_FIELDS = [f.name for f in fields(PropertyInputs)]
+PROPERTY_DEFAULTS = {f.name: f.default for f in fields(PropertyInputs) if f.name != "purchase_price"}
+
+
+def market_arrays(price_mean, stats_mean, stats_std, occupancy_mean, occupancy_std):
+    """
+    Per-property market parameters with gaps filled.
+
+    The price spread keeps the market's coefficient of variation around
+    ``price_mean``; missing occupancy falls back to the defaults.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = stats_std / stats_mean
+    cv = np.where(np.isfinite(cv) & (cv > 0), cv, DEFAULT_PRICE_CV)
+    known = np.isfinite(occupancy_mean) & (occupancy_mean > 0)
+    occupancy_std = np.where(known & np.isfinite(occupancy_std), occupancy_std, DEFAULT_OCCUPANCY_STD)
+    occupancy_mean = np.where(known, occupancy_mean, DEFAULT_OCCUPANCY_MEAN)
+    return price_mean, price_mean * cv, occupancy_mean, occupancy_std
+
+
+def monthly_mortgage_payment(principal, rate_pct, years):
+    """
+    Fixed monthly repayment of an amortising loan (scalars or arrays).
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    n = np.asarray(years, dtype=np.float64) * 12
+    r = np.asarray(rate_pct, dtype=np.float64) / 100 / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortising = principal * r / (1 - (1 + r) ** -n)
+        payment = np.where(r == 0, principal / n, amortising)
+    return np.where(principal <= 0, 0.0, payment)
+
+
+def _beta_params(mean, std):
+    mean = np.clip(mean, 0.01, 0.99)
+    var = np.clip(np.square(std), 1e-6, mean * (1 - mean) * 0.99)
+    common = mean * (1 - mean) / var - 1
+    return mean * common, (1 - mean) * common
+
+
+def simulate_many(prop, market, n_scenarios=5000, seed=0):
+    """
+    Simulate every property in ``prop`` against its ``market``.
+
+    ``prop`` maps each PropertyInputs field to a 1-D array and ``market``
+    is the ``(price_mean, price_std, occupancy_mean, occupancy_std)``
+    tuple from ``market_arrays``.  Returns a dict of 1-D arrays:
+    ``roi_p10/p50/p90`` (annual cash-on-cash %), ``revenue_p10/p50/p90``
+    (monthly, after platform fees), ``break_even_p10/p50/p90`` (months;
+    inf when beyond the horizon) and ``break_even_probability``.
+    """
+    rng = np.random.default_rng(seed)
+    price_mean, price_std, occupancy_mean, occupancy_std = (np.asarray(m, dtype=np.float64) for m in market)
+    shape = (len(price_mean), n_scenarios)
+
+    # Nightly price level per scenario, lognormal with the market's mean/std.
+    sigma2 = np.log1p(np.square(price_std / np.maximum(price_mean, 1e-9)))
+    mu = np.log(np.maximum(price_mean, 1e-9)) - sigma2 / 2
+    price = rng.standard_normal(shape, dtype=np.float32)
+    price *= np.sqrt(sigma2).astype(np.float32)[:, None]
+    price += mu.astype(np.float32)[:, None]
+    np.exp(price, out=price)
+
+    a, b = _beta_params(occupancy_mean, occupancy_std)
+    occupancy = rng.beta(a[:, None], b[:, None], size=shape).astype(np.float32)
+
+    # The properties x scenarios buffer is reused in place: price -> revenue.
+    revenue = price
+    revenue *= occupancy
+    revenue *= (DAYS_PER_MONTH * (1 - np.asarray(prop["platform_fee_pct"], dtype=np.float64) / 100)).astype(np.float32)[:, None]
+
+    purchase_price = np.asarray(prop["purchase_price"], dtype=np.float64)
+    deposit = purchase_price * np.asarray(prop["deposit_pct"], dtype=np.float64) / 100
+    mortgage = monthly_mortgage_payment(purchase_price - deposit, prop["mortgage_rate_pct"], prop["mortgage_years"])
+    outgoings = mortgage + np.asarray(prop["monthly_costs"], dtype=np.float64)
+    invested = (deposit + np.asarray(prop["upfront_costs"], dtype=np.float64))[:, None]
+    horizon = np.asarray(prop["horizon_months"], dtype=np.float64)[:, None]
+
+    cashflow = occupancy
+    np.subtract(revenue, outgoings.astype(np.float32)[:, None], out=cashflow)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where(invested > 0, cashflow * (1200 / invested), 0.0)
+        break_even = np.where(cashflow > 0, np.ceil(invested / cashflow), np.inf)
+    break_even = np.where(invested <= 0, 1.0, break_even)
+    # Scenarios that don't break even within the horizon count as inf.
+    break_even[break_even > horizon] = np.inf
+
+    result = {"break_even_probability": np.isfinite(break_even).mean(axis=1)}
+    for name, values, method in (
+        ("roi", roi, "linear"), ("revenue", revenue, "linear"), ("break_even", break_even, "lower"),
+    ):
+        for pct, row in zip(PERCENTILES, np.percentile(values, PERCENTILES, axis=1, method=method)):
+            result[f"{name}_p{pct}"] = row
+    return result
+
+
+class SimulationResult:
+    """
+    Percentile summary of one property's simulation.
+    """
+
+    def __init__(self, result, index, n_scenarios, horizon_months):
+        self.n_scenarios = n_scenarios
+        self.horizon_months = horizon_months
+        self.roi_pct = {pct: float(result[f"roi_p{pct}"][index]) for pct in PERCENTILES}
+        self.monthly_revenue = {pct: float(result[f"revenue_p{pct}"][index]) for pct in PERCENTILES}
+        self.break_even_months = {pct: float(result[f"break_even_p{pct}"][index]) for pct in PERCENTILES}
+        self.break_even_probability = float(result["break_even_probability"][index])
+
+    def summary(self):
+        """
+        One-paragraph description for the chatbot context.
+        """
+        def months(value):
+            return f"{value:.0f} months" if np.isfinite(value) else f"over {self.horizon_months} months"
+
+        return (
+            f"Monte Carlo ROI simulation ({self.n_scenarios} scenarios): annual cash-on-cash ROI "
+            f"p10 {self.roi_pct[10]:.1f}%, median {self.roi_pct[50]:.1f}%, p90 {self.roi_pct[90]:.1f}%. "
+            f"Monthly rental revenue after platform fees p10 £{self.monthly_revenue[10]:.0f}, median £{self.monthly_revenue[50]:.0f}, "
+            f"p90 £{self.monthly_revenue[90]:.0f}. Break-even: median {months(self.break_even_months[50])} "
+            f"(p10 {months(self.break_even_months[10])}, p90 {months(self.break_even_months[90])}); "
+            f"{self.break_even_probability:.0%} of scenarios break even within {self.horizon_months} months."
+        )
+
@@ -0,0 +1,213 @@
+"""
+Batch scoring of candidate properties, outside Streamlit.
+
+Usage:
+    python score_portfolio.py candidates.csv scored.parquet --city London
+    python score_portfolio.py candidates.parquet scored.csv --workers 8
+
+The input (CSV or Parquet) needs ``neighbourhood``, ``room_type`` and
+``purchase_price`` columns, plus ``city`` unless ``--city`` is given; a
+row without a positive ``purchase_price`` stops the run with an error.  Any
+PropertyInputs field (``deposit_pct``, ``mortgage_rate_pct``,
+``monthly_costs``, ...) and any price-model feature (``latitude``,
+``bedrooms``, ...) it has are used; the rest take the app's defaults.
+
+The file is read in chunks, each chunk is scored by ``pricing.score_properties``
+(the code behind the app's "Get Insights" button) in a pool of worker
+processes, and the scored rows are appended to the output in input order
+as they come back, so memory stays flat however large the portfolio is.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import price_model
+import pricing
+from aggregates import CityAggregates
+from city_registry import get_registry
+
+DEFAULT_CHUNK_ROWS = 2_000
+
+# Per-worker state, set up once by _init_worker.
+_cubes = {}
+_aggregates = {}
+
+
+def _init_worker(cubes):
+    _cubes.update(cubes)
+
+
+def score_chunk(chunk, city=None, n_scenarios=pricing.BATCH_SCENARIOS, seed=0):
+    """
+    Score one chunk of candidates; returns the chunk with the score columns
+    appended.  Runs in the worker processes.
+    """
+    cities = chunk["city"] if city is None else pd.Series(city, index=chunk.index)
+    if cities.isna().any():
+        raise ValueError(f"{int(cities.isna().sum())} rows have no city; fill the 'city' column or pass --city")
+    scored = []
+    for name, rows in chunk.groupby(cities, sort=False):
+        if name not in _cubes:
+            raise ValueError(f"unknown city {name!r} (not in cities.toml)")
+        if name not in _aggregates:
+            _aggregates[name] = CityAggregates(_cubes[name])
+        scores = pricing.score_properties(
+            rows, _aggregates[name], price_model.get_predictor(name), n_scenarios=n_scenarios, seed=seed
+        )
+        scored.append(rows.join(scores))
+    return pd.concat(scored).loc[chunk.index]
+
+
+def input_columns(path):
+    """
+    Column names of a CSV or Parquet file, without reading its rows.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def check_input(path, city=None):
+    """
+    Raise ValueError unless ``path`` has the columns scoring needs.
+    """
+    columns = input_columns(path)
+    missing = [col for col in pricing.REQUIRED_COLUMNS if col not in columns]
+    if city is None and "city" not in columns:
+        missing.append("city (or pass --city)")
+    if missing:
+        raise ValueError(f"{path} is missing required columns: {', '.join(missing)}")
+
+
+def read_chunks(path, chunk_rows):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+class ResultWriter:
+    """
+    Appends scored chunks to a CSV or Parquet file.
+
+    Chunks go to a ``.tmp`` file that ``close`` moves into place, so the
+    output only ever holds a complete result; ``abort`` discards it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._schema = None
+        self._tmp_path = path + ".tmp"
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self._tmp_path, self._schema, compression="zstd")
+            self._writer.write_table(table)
+        else:
+            first = self._writer is None
+            frame.to_csv(self._tmp_path, mode="w" if first else "a", header=first, index=False)
+            self._writer = True
+
+    def close(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        if self._writer is not None:
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def score_file(input_path, output_path, city=None, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               n_scenarios=pricing.BATCH_SCENARIOS, log=sys.stderr):
+    """
+    Score ``input_path`` into ``output_path``; returns the number of rows.
+    """
+    check_input(input_path, city)
+    registry = get_registry()
+    cities = [city] if city else registry.city_names()
+    # Workers only need the aggregate cubes (and load the price models
+    # themselves), not the listings.
+    cubes = {}
+    for name in cities:
+        dataset = registry.get(name)
+        if dataset is None:
+            raise ValueError(f"unknown city {name!r} (not in cities.toml)")
+        cubes[name] = dataset.aggregates.cube
+
+    writer = ResultWriter(output_path)
+    rows = 0
+    start = time.perf_counter()
+
+    def emit(frame):
+        nonlocal rows
+        writer.write(frame)
+        rows += len(frame)
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows scored, {rows / elapsed:,.0f} rows/s", end="", file=log, flush=True)
+
+    chunks = read_chunks(input_path, chunk_rows)
+    try:
+        if workers == 0:
+            _init_worker(cubes)
+            for chunk in chunks:
+                emit(score_chunk(chunk, city, n_scenarios))
+        else:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cubes,)) as pool:
+                # A bounded window of chunks in flight keeps memory flat;
+                # results are written in submission (= input) order.
+                window = 2 * workers
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(score_chunk, chunk, city, n_scenarios))
+                    if len(pending) >= window:
+                        emit(pending.pop(0).result())
+                for future in pending:
+                    emit(future.result())
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        print(file=log)
+    writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="candidate properties (.csv or .parquet)")
+    parser.add_argument("output", help="scored properties (.csv or .parquet)")
+    parser.add_argument("--city", help="score every row against this city instead of a 'city' column")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count, 0: in-process)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument("--scenarios", type=int, default=pricing.BATCH_SCENARIOS, help="Monte Carlo scenarios per property")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        total = score_file(args.input, args.output, args.city, args.workers, args.chunk_rows, args.scenarios)
+    except ValueError as exc:
+        sys.exit(f"score_portfolio: {exc}")
+    elapsed = time.perf_counter() - started
+    print(f"Scored {total:,} properties into {args.output} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
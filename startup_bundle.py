@@ -0,0 +1,96 @@
+"""
+Prebuilt per-city startup bundles.
+
+A bundle holds what the first view of a city needs: the aggregate cube
+(which also gives the neighbourhood/room type dropdowns), the summary text
+and the map's centre, per-zoom bins and point sample.  It is one pickle per
+city under ``files/cache``, keyed on the data version, so a stale bundle is
+never served.  ``CityRegistry`` opens a city from its bundle when one
+matches; the listings themselves are read only when a view needs them
+(comparables, a data refresh).
+
+Build the bundles at deploy time, after the city data is in place:
+    python startup_bundle.py            # every city in cities.toml
+    python startup_bundle.py London
+"""
+import glob
+import os
+import pickle
+import sys
+import time
+
+import aggregates
+import datasets
+
+# Bump when the bundle's contents change so existing bundles are ignored.
+BUNDLE_FORMAT = 1
+
+
+def bundle_path(csv_path, version, cache_dir=datasets.CACHE_DIR):
+    stem = datasets.cache_stem(csv_path)
+    return os.path.join(
+        cache_dir, f"{stem}.startup.{version}.c{aggregates.CUBE_VERSION}.b{BUNDLE_FORMAT}.pkl"
+    )
+
+
+def build_bundle(dataset):
+    """
+    Bundle dict for a city_registry.CityDataset.
+    """
+    city_aggregates = dataset.aggregates
+    return {
+        "version": dataset.version,
+        "rows": dataset.rows,
+        "cube": city_aggregates.cube,
+        "summaries": {dataset.name: city_aggregates.summary_text(dataset.name)},
+        "map": dataset.map_data.state(),
+    }
+
+
+def write_bundle(dataset, cache_dir=datasets.CACHE_DIR):
+    """
+    Build and persist the bundle of ``dataset``, replacing older versions.
+    """
+    bundle = build_bundle(dataset)
+    path = bundle_path(dataset.csv_path, dataset.version, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = datasets.cache_stem(dataset.csv_path)
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}.startup.*.pkl")):
+        os.remove(stale)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        pickle.dump(bundle, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_bundle(csv_path, cache_dir=datasets.CACHE_DIR):
+    """
+    The bundle for the current data of ``csv_path``, or None if there is
+    no up-to-date one.
+    """
+    version = datasets.cached_version(csv_path, cache_dir)
+    if version is None:
+        return None
+    try:
+        with open(bundle_path(csv_path, version, cache_dir), "rb") as fh:
+            bundle = pickle.load(fh)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return bundle if bundle.get("version") == version else None
+
+
+if __name__ == "__main__":
+    from city_registry import get_registry
+
+    registry = get_registry()
+    for city in sys.argv[1:] or registry.city_names():
+        if registry.city_config(city) is None:
+            print(f"{city}: not in cities.toml, skipped")
+            continue
+        if load_bundle(registry.csv_path(city)) is not None:
+            print(f"{city}: bundle up to date")
+            continue
+        started = time.perf_counter()
+        path = write_bundle(registry.get(city))
+        print(f"{city}: {os.path.getsize(path) / 2**20:.1f} MB bundle in {time.perf_counter() - started:.1f}s -> {path}")
@@ -0,0 +1,158 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Serves ``POST /v1/chat/completions`` in both the plain and the streaming
+(server-sent events) format, echoing a canned answer word by word, so the
+app can be exercised offline:
+
+    python stub_openai_server.py --port 8765 --token-delay 0.05
+    OPENAI_API_BASE=http://127.0.0.1:8765/v1 streamlit run investor.py
+
+``--latency`` delays every response and ``--error-rate`` / ``--fail-first``
+inject HTTP errors, to exercise the client's timeouts and retries.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "**Stub advisor reply.** Based on the summarized listings, the average nightly price "
+    "in the selected area is shown in the sidebar. This answer comes from the local stub server."
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubOpenAI/1.0"
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply_text(self, body):
+        user_turns = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"]
+        question = user_turns[-1] if user_turns else ""
+        return f"{self.server.reply} (You asked: {question})"
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.request_count += 1
+            fail = (
+                self.server.request_count <= self.server.fail_first
+                or random.random() < self.server.error_rate
+            )
+        time.sleep(self.server.latency)
+        if fail:
+            self._send_json(self.server.error_status, {"error": {"message": "injected failure"}})
+            return
+
+        model = body.get("model", "gpt-4")
+        text = self._reply_text(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            time.sleep(self.server.token_delay * len(text.split()))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": 0},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant"})
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.server.token_delay)
+            event({"content": word if i == 0 else " " + word})
+        event({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=0, token_delay=0.0, reply=DEFAULT_REPLY, verbose=False,
+                latency=0.0, error_rate=0.0, fail_first=0, error_status=503):
+    """
+    Build (but don't start) a stub server; ``port=0`` picks a free port.
+
+    ``request_count`` on the returned server counts completion requests.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.token_delay = token_delay
+    server.reply = reply
+    server.verbose = verbose
+    server.latency = latency
+    server.error_rate = error_rate
+    server.fail_first = fail_first
+    server.error_status = error_status
+    server.request_count = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_in_thread(**kwargs):
+    """
+    Start a stub server on a daemon thread; returns ``(server, base_url)``.
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between streamed words")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--fail-first", type=int, default=0, help="fail this many requests first")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    args = parser.parse_args()
+
+    stub = make_server(
+        args.host, args.port, args.token_delay, verbose=True, latency=args.latency,
+        error_rate=args.error_rate, fail_first=args.fail_first, error_status=args.error_status,
+    )
+    print(f"Stub OpenAI server on http://{args.host}:{args.port}/v1")
+    stub.serve_forever()
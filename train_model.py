@@ -0,0 +1,34 @@
+"""
+Offline training for the nightly price model.
+
+Usage:
+    python train_model.py            # every city in cities.toml
+    python train_model.py London     # just the named cities
+
+Each run writes a new versioned artifact under models/<city>/; the app
+picks up the newest one on its next rerun.
+"""
+import sys
+
+import price_model
+from city_registry import get_registry
+
+
+def train_city(registry, city):
+    dataset = registry.get(city)
+    if dataset is None:
+        print(f"{city}: not in cities.toml, skipped")
+        return
+    artifact = price_model.train_price_model(dataset.df, city, dataset.version)
+    path = price_model.save_artifact(artifact)
+    metrics = artifact["metrics"]
+    print(
+        f"{city}: wrote {path} (MAE {metrics['mae']:.2f}, R2 on log price {metrics['r2_log']:.3f}, "
+        f"{metrics['n_train']} train / {metrics['n_test']} test rows)"
+    )
+
+
+if __name__ == "__main__":
+    registry = get_registry()
+    for city in sys.argv[1:] or registry.city_names():
+        train_city(registry, city)